@@ -1,21 +1,23 @@
 import pygame
 from Client_side.App.Button import Button
+from Client_side.App.AssetManager import assets
+from Client_side.App.DirtyRects import DirtyRects
 
 
 class AddStory:
-    def __init__(self, screen, client, player_pos_x, player_pos_y):
+    def __init__(self, screen, client, outbox, player_pos_x, player_pos_y):
         self.screen = screen
         self.client = client
+        self.outbox = outbox  # Stories are saved here and uploaded in the background
         self.player_pos_x = player_pos_x
         self.player_pos_y = player_pos_y
         self.running = True
         self.story_title = ""
         self.story_content = ""
-        self.font = pygame.font.Font("../font.ttf", 24)
-        self.title_font = pygame.font.Font("../font.ttf", 48)
+        self.font = assets.font("../font.ttf", 24)
+        self.title_font = assets.font("../font.ttf", 48)
         self.window_width, self.window_height = self.screen.get_size()
-        self.bg_image = pygame.transform.scale(pygame.image.load("../assets/story.png"),
-                                               (self.window_width, self.window_height))
+        self.bg_image = assets.image("../assets/story.png", (self.window_width, self.window_height))
 
         # Calculate center positions
         self.input_box_title = pygame.Rect((self.window_width - 500) // 2, self.window_height //  2 - 150, 500, 50)
@@ -30,6 +32,12 @@ class AddStory:
         ]
 
         self.active_input = None
+        self.dirty = DirtyRects(self.screen.get_rect())  # Parts of the window to redraw, nothing while idle
+        self.clock = pygame.time.Clock()
+
+    def text_area(self, rect):
+        """The area an input box's text may cover, long text runs below the box"""
+        return pygame.Rect(rect.x, rect.y, rect.width, self.window_height - rect.y)
 
     def handle_events(self):
         for event in pygame.event.get():
@@ -57,8 +65,22 @@ class AddStory:
                             self.story_content += event.unicode
                     print(f"Story Title: {self.story_title}")
                     print(f"Story Content: {self.story_content}")
+                    self.dirty.mark(self.text_area(self.input_box_title if self.active_input == 'title'
+                                                   else self.input_box_content))
+
+            elif event.type == pygame.MOUSEMOTION:
+                # Buttons may change their hover color
+                for button in self.buttons:
+                    self.dirty.mark(button.get_render_rect())
+
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.dirty.mark_all()
 
             elif event.type == pygame.MOUSEBUTTONDOWN:
+                # The selected box is highlighted
+                self.dirty.mark(self.text_area(self.input_box_title))
+                self.dirty.mark(self.text_area(self.input_box_content))
+
                 # Check if the mouse click is within the title or content input box
                 if self.input_box_title.collidepoint(event.pos):
                     self.active_input = 'title'
@@ -81,11 +103,15 @@ class AddStory:
                             self.running = False
 
     def render(self):
+        """Redraw the parts of the window that changed."""
+        self.dirty.draw(self.screen, lambda area: self.draw())
+
+    def draw(self):
         self.screen.blit(self.bg_image, (0, 0))
 
         # Title Text (Reverse the Hebrew text if it's in Hebrew)
         title_text = self.reverse_words_and_letters_in_text("הוסף סיפור")
-        title_text = self.title_font.render(title_text, True, (0, 0, 0))
+        title_text = assets.text(self.title_font, title_text, (0, 0, 0))
         title_rect = title_text.get_rect(center=(self.window_width // 2, self.input_box_title.y - 75))
         self.screen.blit(title_text, title_rect)
 
@@ -116,12 +142,10 @@ class AddStory:
         else:
             pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
 
-        pygame.display.flip()
-
     def submit_story(self):
         if self.story_title and self.story_content:
-            self.client.add_story(self.story_title, "- " + self.story_content, self.client.get_user(),
-                                  self.player_pos_x, self.player_pos_y)
+            self.outbox.add(self.story_title, "- " + self.story_content, self.client.get_user(),
+                            self.player_pos_x, self.player_pos_y)
             print("Story submitted:", self.story_title, self.story_content, self.player_pos_x, self.player_pos_y)
             self.running = False
 
@@ -158,7 +182,7 @@ class AddStory:
             lines = lines[::-1]
 
         for line in lines:
-            rendered_text = self.font.render(line, True, (0, 0, 0))
+            rendered_text = assets.text(self.font, line, (0, 0, 0))
             # Check if the line contains Hebrew text
             if any(0x0590 <= ord(char) <= 0x05FF for char in line):
                 # Reverse the order of words for Hebrew text (right-to-left)
@@ -176,6 +200,7 @@ class AddStory:
         while self.running:
             self.handle_events()
             self.render()
+            self.clock.tick(60)
 
     def reverse_words_and_letters_in_text(self, text):
         """Reverse the order of words and the letters in each word if it's Hebrew"""
@@ -1,6 +1,9 @@
 from xml.dom.minidom import Entity
 
 import pygame
+import queue
+import threading
+import time
 from Client_side.App.GameObject import *
 from Client_side.App.Player import Player
 from Client_side.App.Others import Others
@@ -10,9 +13,16 @@ from Client_side.App.StoryWindow import StoryWindow
 from Client_side.App.AddStory import AddStory
 from Client_side.App.User import User
 from Client_side.App.Button import Button
+from Client_side.App.StoryCache import StoryCache
+from Client_side.App.StoryOutbox import StoryOutbox
+from Client_side.App.AssetManager import assets
+from Client_side.App.EntityStore import EntityStore, MAP, BUTTON, STORY, OTHERS, PLAYER
+from Client_side.App.RenderQueue import RenderQueue, Overlay
+from Client_side.App.DirtyRects import DirtyRects
 
 class AppEngine:
-    def __init__(self, client, status, width=1280, height=720, title="Game Engine"):
+    def __init__(self, client, status, width=1280, height=720, title="Game Engine", interpolation_delay=0.1,
+                 stories_per_frame=20, dirty_rendering=True):
         pygame.init()
         self.client = client
         self.status = status
@@ -22,7 +32,13 @@ class AppEngine:
         pygame.display.set_caption(title)
         self.clock = pygame.time.Clock()
         self.running = True
-        self.entities = []  # List of game entities
+        self.entities = EntityStore()  # Game entities, with their positions and bounds in NumPy columns
+        self.render_queue = RenderQueue(self.entities)  # Draws the entities layer by layer
+        self.render_queue.add_overlay(Overlay(self.render_collision_info))
+        self.dirty_rendering = dirty_rendering  # Redraw only the changed parts of the screen, or all of it every frame
+        self.dirty = DirtyRects(self.screen.get_rect())
+        self.drawn_camera = None  # Camera position of the last drawn frame
+        self.drawn_preview = None  # Story previewed in the last drawn frame
         self.background_color = (30, 30, 30)
         self.bStart = True
         self.player = None
@@ -31,18 +47,59 @@ class AppEngine:
         self.camera_speed = 5  # Speed of camera movement
         self.button_radius = 50  # Button settings
         self.read_more_button_rect = None  # Initialize it safely
+        self.wrapped_preview = None  # (preview, wrapped lines) of the last story preview shown
         self.refresh_story = pygame.time.get_ticks()  # Track the last time stories were loaded
-        self.refresh_user = pygame.time.get_ticks()  # Track the last time stories were loaded
+        self.stories_cursor = 0  # Number of server stories already placed on the map
+        self.stories_version = None  # Version of the server's story store the placed stories came from
+        self.story_cache = StoryCache(f"{client.server_host}:{client.tcp_port}")
+        self.story_outbox = StoryOutbox(client)  # Written stories waiting to be uploaded
+        self.story_queue = queue.Queue()  # Items of the story stream, filled by a background thread
+        self.stories_per_frame = stories_per_frame  # Most streamed stories placed on the map in one frame
+        self.loading_stories = False  # True until a started story stream is fully placed
+        self.received_stories = None  # (start, titles, contents, usernames, pos_x, pos_y) of the current stream
+        self.last_snapshot_id = 0  # Last player snapshot applied from the network thread
+        self.interpolation_delay = interpolation_delay  # Seconds remote players are rendered behind
 
     def add_entity(self, entity):
         """Add an entity to the game"""
-        self.entities.append(entity)
+        if isinstance(entity, Story):
+            self.entities.add(entity, STORY)
+        elif isinstance(entity, Others):
+            self.entities.add(entity, OTHERS)
+        elif isinstance(entity, Player):
+            self.entities.add(entity, PLAYER)
+        elif isinstance(entity, Button):
+            self.entities.add(entity, BUTTON, screen_space=True)
+        else:
+            self.entities.add(entity, MAP)
+        self.mark_entity(entity)
+
+    def remove_entities(self, entities):
+        """Remove entities from the game"""
+        for entity in entities:
+            self.mark_entity(entity)
+            self.entities.remove(entity)
+
+    def mark_entity(self, entity):
+        """Redraw the area an entity in the store draws on with the next frame"""
+        rect = entity.get_render_rect()
+        if not self.entities.screen_space[entity.index]:
+            rect = rect.move(-self.camera.x, -self.camera.y)
+        self.dirty.mark(rect)
 
     def handle_events(self):
         """Handle events like key presses or mouse clicks"""
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 self.running = False
+            elif event.type == pygame.MOUSEMOTION:
+                # Buttons may change their hover color
+                for button in self.entities.entities(BUTTON):
+                    self.dirty.mark(button.get_render_rect())
+                if hasattr(self, 'read_more_button'):
+                    self.dirty.mark(self.read_more_button.get_render_rect())
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.dirty.mark_all()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 # Handle button clicks
                 self.handle_button_click(pygame.mouse.get_pos())
@@ -52,8 +109,8 @@ class AppEngine:
         print(f"Mouse clicked at: {mouse_pos}")  # Debugging
 
         # Handle Plus button click
-        for entity in self.entities:
-            if isinstance(entity, Button) and entity.on_click(mouse_pos):
+        for entity in self.entities.entities(BUTTON):
+            if entity.on_click(mouse_pos):
 
                 if entity.button_name == "add_story" :
                     self.add_story_window()
@@ -73,13 +130,15 @@ class AppEngine:
         if story:
             story_window = StoryWindow(self.screen, story.get_description())
             story_window.run(self.screen)  # Run the story window
+            self.dirty.mark_all()  # The window drew over the whole screen
 
 
     def add_story_window(self):
         """Start the AddStory window for adding new stories"""
-        add_story_window = AddStory(self.screen, self.client, self.player.get_rect().x, self.player.get_rect().y)
+        add_story_window = AddStory(self.screen, self.client, self.story_outbox, self.player.get_rect().x, self.player.get_rect().y)
         add_story_window.run()
-        self.load_stories()
+        self.dirty.mark_all()  # The window drew over the whole screen
+        # The story is loaded back once the outbox uploaded it, see update
 
     def render_collision_info(self):
         """Render information about the collision on the screen"""
@@ -108,9 +167,9 @@ class AppEngine:
             self.screen.blit(info_box_surface, (text_x - info_box_width // 2, text_y - info_box_height // 2))
 
             # Set up fonts
-            font = pygame.font.Font("../font.ttf", 24)
-            title_font = pygame.font.Font("../font.ttf", 30)
-            from_font = pygame.font.Font("../font.ttf", 20)
+            font = assets.font("../font.ttf", 24)
+            title_font = assets.font("../font.ttf", 30)
+            from_font = assets.font("../font.ttf", 20)
 
             # Get preview text (and truncate if necessary)
             preview = self.colliding_entity_info.get_description()[:35] + "..." if len(
@@ -127,17 +186,21 @@ class AppEngine:
 
     def wrap_text_and_render(self, preview, font, text_position, from_font, title_font):
         """Wrap text to fit inside the info box and render it"""
-        wrapped_lines = []
-        for raw_line in preview.splitlines():
-            words = raw_line.split()
-            line = ""
-            for word in words:
-                if font.size(line + word)[0] < 400 - 50:
-                    line += word + " "
-                else:
-                    wrapped_lines.append(line)
-                    line = word + " "
-            wrapped_lines.append(line)
+        # The preview stays the same while the player stands on a story, wrap it only when it changes
+        if self.wrapped_preview is None or self.wrapped_preview[0] != preview:
+            wrapped_lines = []
+            for raw_line in preview.splitlines():
+                words = raw_line.split()
+                line = ""
+                for word in words:
+                    if font.size(line + word)[0] < 400 - 50:
+                        line += word + " "
+                    else:
+                        wrapped_lines.append(line)
+                        line = word + " "
+                wrapped_lines.append(line)
+            self.wrapped_preview = (preview, wrapped_lines)
+        wrapped_lines = self.wrapped_preview[1]
 
         line_y = text_position[1] - 100
         for idx, line in enumerate(wrapped_lines):
@@ -150,28 +213,32 @@ class AppEngine:
             else:
                 line_font = font  # Use the regular font for subsequent lines
 
-            text_surface = line_font.render(line, True, (0, 0, 0))
+            text_surface = assets.text(line_font, line, (0, 0, 0))
             self.screen.blit(text_surface, (text_position[0] - text_surface.get_width() // 2, line_y))
             line_y += text_surface.get_height() + 5
 
 
     def render(self):
-        """Render all entities to the screen"""
+        """Redraw the parts of the screen that changed since the last frame"""
+        # Scrolling or a different story preview changes the whole screen
+        if (not self.dirty_rendering or self.camera.topleft != self.drawn_camera
+                or self.colliding_entity_info is not self.drawn_preview):
+            self.dirty.mark_all()
+        self.drawn_camera = self.camera.topleft
+        self.drawn_preview = self.colliding_entity_info
+        self.dirty.draw(self.screen, self.draw)
+
+    def draw(self, area):
+        """Render the entities touching area, a part of the screen"""
         self.screen.fill(self.background_color)
 
-        # Render all entities except the player
-        for entity in self.entities:
-            if entity is not self.player:
-                    entity.render(self.screen, self.camera)
-
-        for entity in self.entities:
-            if entity is not self.player:
-                if isinstance(entity, Others):
-                    entity.render(self.screen, self.camera)
+        # One pass over the entities the camera sees: map, stories, other players, the player,
+        # buttons, then the story preview
+        self.render_queue.render(self.screen, self.camera, area)
 
         is_hover = False
-        for entity in self.entities:
-            if isinstance(entity, Button) and entity.is_hovered:
+        for entity in self.entities.entities(BUTTON):
+            if entity.is_hovered:
                 is_hover = True
                 break
             # Change the cursor to a hand on hover (this will now always be updated in the render)
@@ -181,15 +248,6 @@ class AppEngine:
         else:
             pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
 
-        # Render the player last to ensure it's on top
-        if self.player:
-            self.player.render(self.screen, self.camera)
-
-        # Render collision info if any
-        self.render_collision_info()
-
-        pygame.display.flip()
-
     def reverse_words_and_letters_in_text(self, text):
         """Reverse the order of words and the letters in each word if it's Hebrew"""
         words = text.split()  # Split the text into words
@@ -208,7 +266,7 @@ class AppEngine:
         print("Game is starting...")
 
         # Load the map
-        map_entity = Map(-2920  , -2580,  6530, 9796, "../assets/map.png")
+        map_entity = Map(-2920  , -2580,  6530, 9796, "../assets/map.png", "../assets/map_pyramid")
         self.add_entity(map_entity)
         # Create the plus button and player
         add_story_b = Button("add_story", self.width/ 2, self.height - 60, 100, 100, (29, 64, 99), (70, 130, 180), "+", 100 / 2, 0, 75)
@@ -221,107 +279,182 @@ class AppEngine:
         self.player = Player(100, 100,  self.client.username, 50, 50, (0, 255, 0))  # Player as a green square
         self.add_entity(self.player)
 
-        # Load and display stories from the client
+        # Show the stories cached by the last session right away, then fetch only the newer ones
+        cached = self.story_cache.load()
+        if cached:
+            self.stories_version, titles, contents, usernames, positions_x, positions_y = cached
+            self.place_stories(titles, contents, usernames, positions_x, positions_y)
+            self.stories_cursor = len(titles)
         self.load_stories()
 
+        # Exchange player positions on a background thread from now on
+        self.client.start_network()
+
+        # Upload stories written in this or an earlier session that were not sent yet
+        self.story_outbox.start()
+
     def load_stories(self):
-        """Load and place stories on the map with specific positions"""
+        """Start fetching the stories added since the last load, they are placed by place_received_stories"""
+        if self.loading_stories:
+            return
+        self.loading_stories = True
+        threading.Thread(target=self.fetch_stories, args=(self.stories_cursor, self.stories_version),
+                         daemon=True).start()
+
+    def fetch_stories(self, since, version):
+        """Background thread: pass the story stream to the render loop through the story queue"""
         try:
-            stories = self.client.receive_stories()
-            print("Stories received:", stories)  # Debugging line
-
-            if not stories:
-                print("No stories received.")
+            for item in self.client.stream_stories(since, version):
+                self.story_queue.put(item)
+        except Exception as e:
+            print("Error while loading stories:", e)
+        self.story_queue.put(None)  # End of the stream
+
+    def place_received_stories(self):
+        """Place up to stories_per_frame streamed stories, so a large download never stalls a frame"""
+        for _ in range(self.stories_per_frame):
+            try:
+                item = self.story_queue.get_nowait()
+            except queue.Empty:
                 return
 
-            titles, contents, usernames, positions_x, positions_y = stories
+            if item is None:
+                # Stream finished, keep what arrived for the next startup
+                if self.received_stories is not None:
+                    self.story_cache.store(self.stories_version, *self.received_stories)
+                    self.received_stories = None
+                self.loading_stories = False
+            elif self.received_stories is None:
+                version, start, total = item
+                if start < self.stories_cursor:
+                    # The server sent everything from an earlier point (its store was reset), drop our copies
+                    self.entities.remove_kind(STORY)
+                    self.dirty.mark_all()
+                self.stories_cursor = start
+                self.stories_version = version
+                self.received_stories = (start, [], [], [], [], [])
+            else:
+                title, content, username, x, y = item
+                self.place_story(title, content, username, x, y)
+                for column, value in zip(self.received_stories[1:], item):
+                    column.append(value)
+                self.stories_cursor += 1
 
-            for (title, username, content, x, y) in zip(titles, usernames, contents, positions_x, positions_y):
-                print(f"Adding story at position: ({x}, {y})")  # Debugging print for positions
-                story = Story(x, y, 100, 100, (255, 0, 0),
-                              self.reverse_words_and_letters_in_text(f" מאת: {username}") + "\n"
-                              + self.reverse_words_and_letters_in_text(title) + "\n"
-                              + self.reverse_words_and_letters_in_text(content))
-                self.add_entity(story)
+    def place_stories(self, titles, contents, usernames, positions_x, positions_y):
+        """Add a Story entity on the map for every story"""
+        for (title, content, username, x, y) in zip(titles, contents, usernames, positions_x, positions_y):
+            self.place_story(title, content, username, x, y)
 
-        except Exception as e:
-            print("Error while loading stories:", e)
+    def place_story(self, title, content, username, x, y):
+        """Add a Story entity on the map"""
+        print(f"Adding story at position: ({x}, {y})")  # Debugging print for positions
+        story = Story(x, y, 100, 100, (255, 0, 0),
+                      self.reverse_words_and_letters_in_text(f" מאת: {username}") + "\n"
+                      + self.reverse_words_and_letters_in_text(title) + "\n"
+                      + self.reverse_words_and_letters_in_text(content))
+        self.add_entity(story)
 
 
 
     def update(self):
         """Update all entities in the game"""
-        for entity in self.entities:
+        # Stories never change, only the rest needs updating
+        for entity in self.entities.entities(MAP, BUTTON, PLAYER):
             entity.update()
+        self.update_others()
 
         # Update camera position to follow the player
         self.camera.center = self.player.get_rect().center
 
         current_time = pygame.time.get_ticks()
 
-
-
-        if current_time - self.refresh_user >= 1:  # 10 seconds
-            self.create_player()
-            self.refresh_user = current_time
+        # Hand the position to the network thread and apply the newest snapshot, never waiting on the network
+        self.client.network.set_position(self.player.x, self.player.y, self.player.sequence)
+        self.create_player()
+        self.place_received_stories()
 
         if current_time - self.refresh_story >= 10000:  # 10 seconds
             self.load_stories()
             self.refresh_story = current_time
+        elif self.story_outbox.uploaded.is_set() and not self.loading_stories:
+            # Our own stories reached the server, load them now instead of on the next refresh
+            self.story_outbox.uploaded.clear()
+            self.load_stories()
+
 
 
+    def update_others(self):
+        """Move every other player to its interpolated position in one go"""
+        now = time.monotonic()
+        rows, xs, ys, moved = [], [], [], []
+        for row in self.entities.indices(OTHERS):
+            other = self.entities.objects[row]
+            position = other.position_at(now)
+            if position:
+                rows.append(row)
+                xs.append(position[0])
+                ys.append(position[1])
+                moved.append((other, other.get_render_rect()))
+        if rows:
+            self.entities.set_positions(rows, xs, ys)
+
+        # Redraw where the players were and where they are now
+        for other, old_rect in moved:
+            new_rect = other.get_render_rect()
+            if new_rect != old_rect:
+                self.dirty.mark(old_rect.move(-self.camera.x, -self.camera.y))
+                self.dirty.mark(new_rect.move(-self.camera.x, -self.camera.y))
 
     def create_player(self):
         try:
-            # Send player data and receive the number of players and their details
-            num_of_players, users = self.client.send_player_data(self.player.x, self.player.y)
-            print(f"Number of players: {num_of_players}")
-
-            if not users:  # Check if the list of users is empty or invalid
-                print("Warning: No players found in the user list.")
-                return  # Early exit if no users are present
-
-            # First, remove entities that are no longer in the users list
-            usernames_in_users = [user.username for user in users]
-            self.entities = [entity for entity in self.entities if
-                             not (isinstance(entity, Others) and entity.username not in usernames_in_users)]
-
-            if num_of_players > 1:
-                for user in users:
-                    if not hasattr(user, 'username') or not hasattr(user, 'pos_x') or not hasattr(user, 'pos_y'):
-                        print(f"Warning: Invalid user data found for {user}. Skipping.")
-                        continue  # Skip this user if they don't have the expected properties
-
-                    if user.username != self.client.username:
-                        print(f"User {user.username} at position ({user.pos_x}, {user.pos_y})")
-
-                        found = False  # Flag indicating whether the player already exists
-
-                        for entity in self.entities:
-                            if isinstance(entity, Others) and entity.username == user.username:
-                                print(f"Updating {user.username}: pos_x={user.pos_x}, pos_y={user.pos_y}")
-                                entity.x = user.pos_x
-                                entity.y = user.pos_y
-                                found = True
-                                break
-
-                        if not found:
-                            # Add new player to the entities list
-                            other = Others(self.player.get_rect().x, self.player.get_rect().y, user.username)
-                            self.entities.append(other)
-                            print(f"Added new player: {user.username}")
-
+            # Read the latest players received by the network thread, straight from its snapshot columns
+            with self.client.network.latest_snapshot() as snapshot:
+                if snapshot is None or snapshot.snapshot_id == self.last_snapshot_id:
+                    return  # Nothing new since the last frame
+                self.last_snapshot_id = snapshot.snapshot_id
+                self.apply_snapshot(snapshot)
         except Exception as e:
             print(f"Error in create_player: {e}")
 
+    def apply_snapshot(self, snapshot):
+        """Reconcile the local player and move the other players to a PlayerSnapshot"""
+        num_of_players = snapshot.count
+        if not num_of_players:  # Check if the list of users is empty
+            print("Warning: No players found in the user list.")
+            return  # Early exit if no users are present
+
+        usernames_in_users = set(snapshot.usernames[:num_of_players])
+
+        # First, remove entities that are no longer in the users list
+        others = {entity.username: entity for entity in self.entities.entities(OTHERS)}
+        self.remove_entities([entity for username, entity in others.items() if username not in usernames_in_users])
+
+        for index in range(num_of_players):
+            username = snapshot.usernames[index]
+            pos_x = snapshot.pos_x[index]
+            pos_y = snapshot.pos_y[index]
+
+            if username == self.client.username:
+                # Correct the locally predicted player with the server's position
+                self.player.reconcile(snapshot.sequences[index], int(pos_x), int(pos_y))
+            elif username in others:
+                # Buffer the position, update_others interpolates towards it
+                others[username].add_snapshot(snapshot.received_at, pos_x, pos_y)
+            else:
+                # Add new player to the entities list
+                other = Others(round(pos_x), round(pos_y), username, interpolation_delay=self.interpolation_delay)
+                other.add_snapshot(snapshot.received_at, pos_x, pos_y)
+                self.add_entity(other)
+                print(f"Added new player: {username}")
+
 
 
-    def collide_handle(self, entities):
+    def collide_handle(self):
         """Check for collisions and store collision info for display"""
-        self.colliding_entity_info = None  # Reset info on each frame
-        for entity in entities:
-            if isinstance(entity, Story) and self.player.get_rect().colliderect(entity.get_rect()):
-                self.colliding_entity_info = entity  # Store the collided entity for rendering info
+        # Test the player against every story's rect at once
+        colliding = self.entities.colliding(self.player.get_rect(), STORY)
+        # Store the collided entity for rendering info, the last added one if stories overlap
+        self.colliding_entity_info = colliding[-1] if colliding else None
 
     def run(self, fps=60):
         """Main game loop"""
@@ -333,12 +466,14 @@ class AppEngine:
             while self.running and self.client.running:
                 self.handle_events()
                 self.update()
-                self.collide_handle(self.entities)
+                self.collide_handle()
                 self.render()
                 self.clock.tick(fps)
         except Exception as e:
             print("Unexpected error:", e)
 
+        self.story_outbox.stop()
         self.client.logout()
+        self.story_cache.close()
         self.status[0] = "Log_In"
         pygame.quit()
@@ -0,0 +1,52 @@
+import pygame
+from Client_side.App.PixelCache import load_image
+from Client_side.App.TextCache import TextCache
+
+
+class AssetManager:
+    def __init__(self):
+        """
+        Images and fonts loaded once per process and shared by every entity and window.
+        Images are converted to the display's pixel format, so blitting them needs no conversion.
+        Shared surfaces and fonts must not be changed by their users.
+        """
+        self.images = {}  # (path, size) -> surface in the display format
+        self.fonts = {}  # (path, size, italic, underline) -> font
+        self.texts = TextCache()
+
+    def image(self, path, size=None):
+        """
+        Return the image at path, scaled to size if given.
+        """
+        key = (path, tuple(size) if size is not None else None)
+        image = self.images.get(key)
+        if image is None:
+            image = load_image(path, size)
+            if pygame.display.get_surface() is None:
+                return image  # Converting needs a display, load it again once there is one
+            image = image.convert_alpha()
+            self.images[key] = image
+        return image
+
+    def font(self, path, size, italic=False, underline=False):
+        """
+        Return the font at path in the given point size and style.
+        """
+        key = (path, size, italic, underline)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.Font(path, size)
+            font.set_italic(italic)
+            font.set_underline(underline)
+            self.fonts[key] = font
+        return font
+
+    def text(self, font, text, color, antialias=True):
+        """
+        Return the rendered text, rasterized only the first time it is asked for.
+        """
+        return self.texts.render(font, text, color, antialias)
+
+
+# The one asset manager of the client process
+assets = AssetManager()
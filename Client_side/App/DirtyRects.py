@@ -0,0 +1,48 @@
+import pygame
+
+
+class DirtyRects:
+    def __init__(self, screen_rect, max_rects=32):
+        """
+        Screen areas that changed since the last frame. Only they are redrawn and pushed to the display;
+        past max_rects small areas the whole screen is redrawn instead.
+        """
+        self.screen_rect = pygame.Rect(screen_rect)
+        self.max_rects = max_rects
+        self.rects = []
+        self.full = True  # The first frame draws everything
+
+    def mark(self, rect):
+        """Mark a screen area as changed."""
+        if self.full:
+            return
+        rect = pygame.Rect(rect).clip(self.screen_rect)
+        if rect.width and rect.height:
+            self.rects.append(rect)
+            if len(self.rects) > self.max_rects:
+                self.mark_all()
+
+    def mark_all(self):
+        self.full = True
+        self.rects = []
+
+    def flush(self):
+        """Return the areas to redraw this frame, an empty list if nothing changed, and start a new frame."""
+        rects = [self.screen_rect.copy()] if self.full else self.rects
+        self.full = False
+        self.rects = []
+        return rects
+
+    def draw(self, screen, draw):
+        """
+        Call draw() clipped to the changed areas and push just those areas to the display.
+        Does nothing when nothing changed.
+        """
+        rects = self.flush()
+        if not rects:
+            return
+        area = rects[0].unionall(rects[1:])
+        screen.set_clip(area)
+        draw(area)
+        screen.set_clip(None)
+        pygame.display.update(rects)
@@ -0,0 +1,169 @@
+import numpy as np
+import pygame
+from Client_side.App.SpatialHash import SpatialHash
+
+# Entity kinds, one per row of the store
+MAP = 0
+BUTTON = 1
+STORY = 2
+OTHERS = 3
+PLAYER = 4
+
+
+class EntityStore:
+    def __init__(self, capacity=1024, hashed_kinds=(STORY, OTHERS), cell_size=256):
+        """
+        Struct-of-arrays storage of the game entities: one row per entity with its position, size,
+        drawn area and kind in NumPy columns, so culling, collision and position updates work
+        on whole columns at once. Entities read and write their x and y straight from their row.
+        Rows of the hashed kinds, the ones there are many of, are also kept in a spatial hash, so an
+        area query only tests the rows in the cells it covers instead of every row.
+        """
+        self.capacity = 0
+        self.count = 0  # Rows handed out so far, removed rows are reused from free
+        self.next_order = 0  # Entities are drawn in the order they were added
+        self.free = []
+        self.objects = []  # row -> entity
+        self.x = np.zeros(0, np.int64)
+        self.y = np.zeros(0, np.int64)
+        self.w = np.zeros(0, np.int64)
+        self.h = np.zeros(0, np.int64)
+        # Area render draws on, relative to x and y
+        self.render_left = np.zeros(0, np.int64)
+        self.render_top = np.zeros(0, np.int64)
+        self.render_right = np.zeros(0, np.int64)
+        self.render_bottom = np.zeros(0, np.int64)
+        self.kind = np.zeros(0, np.int8)
+        self.order = np.zeros(0, np.int64)
+        self.alive = np.zeros(0, bool)
+        self.screen_space = np.zeros(0, bool)  # Drawn at a fixed screen position, never culled
+        self.hashed_kinds = frozenset(hashed_kinds)
+        self.grid = SpatialHash(cell_size)  # Hashed rows, by the world area they cover
+        self.unhashed = set()  # Every other live row, few enough to test them all
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        extra = capacity - self.capacity
+        if extra <= 0:
+            return
+        for name in ('x', 'y', 'w', 'h', 'render_left', 'render_top', 'render_right', 'render_bottom',
+                     'kind', 'order', 'alive', 'screen_space'):
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.zeros(extra, column.dtype)]))
+        self.objects.extend([None] * extra)
+        self.capacity = capacity
+
+    def add(self, entity, kind, screen_space=False):
+        """Give an entity a row and attach it, returns the row."""
+        if self.free:
+            index = self.free.pop()
+        else:
+            if self.count == self.capacity:
+                self.grow(self.capacity * 2)
+            index = self.count
+            self.count += 1
+
+        rect = entity.get_rect()
+        render_rect = entity.get_render_rect()
+        self.x[index] = rect.x
+        self.y[index] = rect.y
+        self.w[index] = rect.width
+        self.h[index] = rect.height
+        self.render_left[index] = render_rect.left - rect.x
+        self.render_top[index] = render_rect.top - rect.y
+        self.render_right[index] = render_rect.right - rect.x
+        self.render_bottom[index] = render_rect.bottom - rect.y
+        self.kind[index] = kind
+        self.order[index] = self.next_order
+        self.next_order += 1
+        self.alive[index] = True
+        self.screen_space[index] = screen_space
+        self.objects[index] = entity
+        if kind in self.hashed_kinds and not screen_space:
+            self.grid.insert(index, self.bounds(index))
+        else:
+            self.unhashed.add(index)
+        entity.attach(self, index)
+        return index
+
+    def bounds(self, index):
+        """World area a row covers, both its rect and the area it draws on."""
+        left = min(0, self.render_left[index])
+        top = min(0, self.render_top[index])
+        right = max(self.w[index], self.render_right[index])
+        bottom = max(self.h[index], self.render_bottom[index])
+        return pygame.Rect(int(self.x[index] + left), int(self.y[index] + top), int(right - left), int(bottom - top))
+
+    def moved(self, index):
+        """Update the spatial hash after the position of a row changed."""
+        if index not in self.unhashed:
+            self.grid.move(index, self.bounds(index))
+
+    def remove_rows(self, indices):
+        for index in indices:
+            index = int(index)
+            self.objects[index].detach()
+            self.objects[index] = None
+            self.grid.remove(index)
+            self.unhashed.discard(index)
+            self.alive[index] = False
+            self.free.append(index)
+
+    def remove(self, entity):
+        if entity.store is self:
+            self.remove_rows([entity.index])
+
+    def remove_kind(self, kind):
+        """Remove every entity of a kind."""
+        self.remove_rows(self.indices(kind))
+
+    def in_order(self, indices):
+        return indices[np.argsort(self.order[indices], kind='stable')]
+
+    def indices(self, *kinds):
+        """Rows of the live entities of the given kinds, in the order they were added."""
+        rows = slice(0, self.count)
+        mask = self.alive[rows] & np.isin(self.kind[rows], kinds)
+        return self.in_order(np.flatnonzero(mask))
+
+    def entities(self, *kinds):
+        return [self.objects[index] for index in self.indices(*kinds)]
+
+    def candidates(self, rect):
+        """Live rows that may touch rect: the hashed rows in the cells it covers and every unhashed row."""
+        rows = self.grid.query(rect)
+        rows.update(self.unhashed)
+        return np.fromiter(rows, np.int64, len(rows))
+
+    def in_layers(self, rect, layer_of_kind):
+        """
+        Entities that draw inside rect, or on the screen, ordered by the layer of their kind and then
+        by the order they were added. layer_of_kind maps every kind to its layer, -1 leaves the kind out.
+        """
+        rows = self.candidates(rect)
+        x = self.x[rows]
+        y = self.y[rows]
+        inside = ((x + self.render_left[rows] < rect.right) & (x + self.render_right[rows] > rect.left)
+                  & (y + self.render_top[rows] < rect.bottom) & (y + self.render_bottom[rows] > rect.top))
+        layer = layer_of_kind[self.kind[rows]]
+        keep = (layer >= 0) & (inside | self.screen_space[rows])
+        rows, layer = rows[keep], layer[keep]
+        rows = rows[np.lexsort((self.order[rows], layer))]
+        return [self.objects[index] for index in rows]
+
+    def colliding(self, rect, kind):
+        """Entities of a kind whose rect overlaps rect, in the order they were added."""
+        rows = self.candidates(rect)
+        x = self.x[rows]
+        y = self.y[rows]
+        mask = ((self.kind[rows] == kind)
+                & (x < rect.right) & (x + self.w[rows] > rect.left)
+                & (y < rect.bottom) & (y + self.h[rows] > rect.top))
+        return [self.objects[index] for index in self.in_order(rows[mask])]
+
+    def set_positions(self, indices, xs, ys):
+        """Move many entities at once."""
+        self.x[indices] = np.rint(xs)
+        self.y[indices] = np.rint(ys)
+        for index in indices:
+            self.moved(int(index))
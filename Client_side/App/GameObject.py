@@ -1,9 +1,12 @@
 import pygame
 from PIL.ImageOps import scale
+from Client_side.App.AssetManager import assets
 
 
 class GameObject:
     def __init__(self, x, y, width, height, color=(255, 0, 0), username="", texture_path=None, tex_scale=1):
+        self.store = None  # EntityStore holding the position once the object is added to the game
+        self.index = None  # Row of the object in the store
         self.x = x
         self.y = y
         self.width = width
@@ -11,19 +14,54 @@ class GameObject:
         self.color = color
         self.username = username
         self.scale = tex_scale
-        self.font = pygame.font.Font("../font.ttf", 30)
+        self.font = assets.font("../font.ttf", 30)
 
 
-        # Load texture if provided
+        # Load texture if provided, shared with every object using the same texture and size
         self.texture = None
         if texture_path:
             try:
-                self.texture = pygame.image.load(texture_path)
-                self.texture = pygame.transform.scale(self.texture, (width * tex_scale, height * tex_scale))
-            except pygame.error as e:
+                self.texture = assets.image(texture_path, (width * tex_scale, height * tex_scale))
+            except (pygame.error, OSError) as e:
                 print(f"Error loading texture: {e}")
                 self.texture = None
 
+    @property
+    def x(self):
+        return self._x if self.store is None else int(self.store.x[self.index])
+
+    @x.setter
+    def x(self, value):
+        if self.store is None:
+            self._x = value
+        else:
+            self.store.x[self.index] = value
+            self.store.moved(self.index)
+
+    @property
+    def y(self):
+        return self._y if self.store is None else int(self.store.y[self.index])
+
+    @y.setter
+    def y(self, value):
+        if self.store is None:
+            self._y = value
+        else:
+            self.store.y[self.index] = value
+            self.store.moved(self.index)
+
+    def attach(self, store, index):
+        """Keep the position in a row of an EntityStore from now on."""
+        self.store = store
+        self.index = index
+
+    def detach(self):
+        """Take the position back from the store when the object leaves the game."""
+        x, y = self.x, self.y
+        self.store = None
+        self.index = None
+        self.x, self.y = x, y
+
     def update(self):
         """Update the logic of the object (to be implemented in derived classes)."""
         pass
@@ -38,7 +76,7 @@ class GameObject:
 
         # Draw the username if it exists
         if self.username:
-            text = self.font.render(self.username, True, (255, 255, 255))  # White text
+            text = assets.text(self.font, self.username, (255, 255, 255))  # White text
             text_rect = text.get_rect(center=(self.x + int(self.width * self.scale) // 2 - camera.x, self.y - 20 - camera.y))
             screen.blit(text, text_rect)
 
@@ -46,5 +84,15 @@ class GameObject:
         """Returns the rectangle of the object."""
         return pygame.Rect(self.x, self.y, self.width, self.height)
 
+    def get_render_rect(self):
+        """Returns the area render draws on, including the texture and the username above it."""
+        rect = self.get_rect()
+        if self.texture:
+            rect.union_ip(self.texture.get_rect(topleft=(self.x, self.y)))
+        if self.username:
+            text = assets.text(self.font, self.username, (255, 255, 255))
+            rect.union_ip(text.get_rect(center=(self.x + int(self.width * self.scale) // 2, self.y - 20)))
+        return rect
+
     def on_click(self, mouse_pos):
         pass
@@ -1,16 +1,82 @@
+import math
 import pygame
 from Client_side.App.GameObject import GameObject
+from Client_side.App.TileCache import TileCache
+from Client_side.App.MapPyramid import MapPyramid, build, cut_tile
+from Client_side.App.PixelCache import load_image
 
 class Map(GameObject):
-    def __init__(self, x, y, width, height, image_path):
+    def __init__(self, x, y, width, height, image_path, pyramid_path=None, tile_size=512,
+                 cache_budget=16 * 1024 * 1024):
         super().__init__(x, y, width, height, (0, 0, 0))  # No color needed since it's an image
-        self.image = pygame.image.load(image_path)
-        self.image = pygame.transform.scale(self.image, (width, height))
+        self.tiles = TileCache(cache_budget)  # A few screens of tiles
+        if pyramid_path is not None and not MapPyramid.exists(pyramid_path):
+            # First launch, cut the pyramid once so no later launch keeps the whole map decoded
+            print("Building the map tile pyramid, this happens only once...")
+            try:
+                build(image_path, pyramid_path, width, height, tile_size)
+            except (pygame.error, OSError) as e:
+                print(f"Error building the map tile pyramid: {e}")
+        if MapPyramid.exists(pyramid_path):
+            # Tiles of every zoom level are read from the pyramid, one at a time
+            self.pyramid = MapPyramid(pyramid_path)
+            self.source = None
+            self.tile_size = self.pyramid.tile_size
+            self.levels = [(level["columns"], level["rows"]) for level in self.pyramid.levels]
+        else:
+            # The pyramid couldn't be built, keep the image at its own resolution and cut full size tiles
+            # when they come into view
+            self.pyramid = None
+            self.source = load_image(image_path)
+            self.tile_size = tile_size
+            self.levels = [(math.ceil(width / tile_size), math.ceil(height / tile_size))]
 
-    def render(self, screen, camera):
-        # Draw the map relative to the camera position
-        screen.blit(self.image, (self.x - camera.x, self.y - camera.y))
+    def level_for(self, zoom):
+        """Pick the smallest level that still has at least one pixel per screen pixel"""
+        if zoom >= 1:
+            return 0
+        return min(int(math.log2(1 / zoom)), len(self.levels) - 1)
+
+    def load_tile(self, level, column, row):
+        if self.pyramid is not None:
+            tile = self.pyramid.load_tile(level, column, row)
+        else:
+            tile = cut_tile(self.source, self.width, self.height, 0, column, row, self.tile_size)
+
+        # Match the display format once, so blitting the tile every frame needs no conversion
+        if tile.get_flags() & pygame.SRCALPHA:
+            return tile.convert_alpha()
+        return tile.convert()
+
+    def render(self, screen, camera, zoom=1.0):
+        # Draw only the tiles the camera sees, at most a few whatever the map's size or the zoom
+        level = self.level_for(zoom)
+        columns, rows = self.levels[level]
+        level_scale = 2 ** level  # Map pixels per pixel of this level
+        tile_span = self.tile_size * level_scale  # Map pixels covered by one tile
+
+        # Zooming keeps the camera's center in place and shows more or less of the map around it
+        view_left = camera.x + camera.width * (1 - 1 / zoom) / 2
+        view_top = camera.y + camera.height * (1 - 1 / zoom) / 2
+        first_column = max(0, int((view_left - self.x) // tile_span))
+        last_column = min(columns - 1, int((view_left + camera.width / zoom - self.x) // tile_span))
+        first_row = max(0, int((view_top - self.y) // tile_span))
+        last_row = min(rows - 1, int((view_top + camera.height / zoom - self.y) // tile_span))
+
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                tile = self.tiles.get((level, column, row), lambda: self.load_tile(level, column, row))
+                left = round((self.x + column * tile_span - view_left) * zoom)
+                top = round((self.y + row * tile_span - view_top) * zoom)
+                right = round((self.x + column * tile_span + tile.get_width() * level_scale - view_left) * zoom)
+                bottom = round((self.y + row * tile_span + tile.get_height() * level_scale - view_top) * zoom)
+
+                if (right - left, bottom - top) != tile.get_size():
+                    # Between two levels, scale the tile once and keep it until the zoom changes
+                    tile = self.tiles.get((level, column, row, right - left, bottom - top),
+                                          lambda: pygame.transform.smoothscale(tile, (right - left, bottom - top)))
+                screen.blit(tile, (left, top))
 
     def update(self):
         # No update logic for a static map, but you can add effects here
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,120 @@
+import argparse
+import io
+import json
+import math
+import os
+import pygame
+
+INDEX_FILE = "index.json"
+
+
+def level_count(width, height, tile_size):
+    """Number of levels until the whole map fits in one tile, every level half the size of the one before."""
+    return max(1, math.ceil(math.log2(max(width, height) / tile_size)) + 1)
+
+
+def cut_tile(source, width, height, level, column, row, tile_size):
+    """
+    Cut one tile of the given level straight from the source image, without scaling the whole image first.
+    The map is width x height at level 0, each level halves it.
+    """
+    level_scale = 2 ** level  # Map pixels per level pixel
+    level_width = math.ceil(width / level_scale)
+    level_height = math.ceil(height / level_scale)
+    left = column * tile_size
+    top = row * tile_size
+    tile_width = min(tile_size, level_width - left)
+    tile_height = min(tile_size, level_height - top)
+
+    scale_x = source.get_width() / level_width
+    scale_y = source.get_height() / level_height
+    source_left = int(left * scale_x)
+    source_top = int(top * scale_y)
+    source_rect = pygame.Rect(source_left, source_top,
+                              max(1, math.ceil((left + tile_width) * scale_x) - source_left),
+                              max(1, math.ceil((top + tile_height) * scale_y) - source_top))
+    region = source.subsurface(source_rect.clip(source.get_rect()))
+    if region.get_bitsize() >= 24:
+        return pygame.transform.smoothscale(region, (tile_width, tile_height))
+    return pygame.transform.scale(region, (tile_width, tile_height))
+
+
+def build(image_path, output_dir, width, height, tile_size=512):
+    """
+    Write the tile pyramid of a map image: one file per level with its PNG tiles back to back,
+    and an index with the byte range of every tile.
+    """
+    source = pygame.image.load(image_path)
+    os.makedirs(output_dir, exist_ok=True)
+    index = {"width": width, "height": height, "tile_size": tile_size, "levels": []}
+
+    for level in range(level_count(width, height, tile_size)):
+        level_width = math.ceil(width / 2 ** level)
+        level_height = math.ceil(height / 2 ** level)
+        columns = math.ceil(level_width / tile_size)
+        rows = math.ceil(level_height / tile_size)
+        file_name = f"level_{level}.bin"
+        tiles = []
+        with open(os.path.join(output_dir, file_name), 'wb') as file:
+            for row in range(rows):
+                for column in range(columns):
+                    encoded = io.BytesIO()
+                    pygame.image.save(cut_tile(source, width, height, level, column, row, tile_size), encoded, "tile.png")
+                    offset = file.tell()
+                    file.write(encoded.getvalue())
+                    tiles.append([offset, file.tell() - offset])
+        index["levels"].append({"width": level_width, "height": level_height, "columns": columns, "rows": rows,
+                                "file": file_name, "tiles": tiles})
+        print(f"Level {level}: {level_width}x{level_height}, {columns * rows} tiles")
+
+    # The index is written last and moved into place, so an interrupted build is never taken for a finished one
+    temp_path = os.path.join(output_dir, f"{INDEX_FILE}.{os.getpid()}.tmp")
+    with open(temp_path, 'w') as file:
+        json.dump(index, file)
+    os.replace(temp_path, os.path.join(output_dir, INDEX_FILE))
+
+
+class MapPyramid:
+    def __init__(self, pyramid_dir):
+        """
+        Reads tiles of a pyramid written by build, one tile at a time.
+        """
+        with open(os.path.join(pyramid_dir, INDEX_FILE), 'r') as file:
+            index = json.load(file)
+        self.width = index["width"]
+        self.height = index["height"]
+        self.tile_size = index["tile_size"]
+        self.levels = index["levels"]
+        self.files = [open(os.path.join(pyramid_dir, level["file"]), 'rb') for level in self.levels]
+
+    @staticmethod
+    def exists(pyramid_dir):
+        return pyramid_dir is not None and os.path.isfile(os.path.join(pyramid_dir, INDEX_FILE))
+
+    def load_tile(self, level, column, row):
+        """Decode one tile of a level."""
+        offset, length = self.levels[level]["tiles"][row * self.levels[level]["columns"] + column]
+        file = self.files[level]
+        file.seek(offset)
+        return pygame.image.load(io.BytesIO(file.read(length)), "tile.png")
+
+    def close(self):
+        for file in self.files:
+            file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the map tile pyramid")
+    parser.add_argument("image", help="source map image")
+    parser.add_argument("output_dir")
+    parser.add_argument("--width", type=int, default=6530, help="map width in world pixels")
+    parser.add_argument("--height", type=int, default=9796, help="map height in world pixels")
+    parser.add_argument("--tile-size", type=int, default=512)
+    args = parser.parse_args()
+    build(args.image, args.output_dir, args.width, args.height, args.tile_size)
+
+
+# Map builds the pyramid on first launch, it can also be built ahead of time, e.g.
+# python -m Client_side.App.MapPyramid assets/map.png assets/map_pyramid
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,21 @@
 from Client_side.App.GameObject import *
+from Client_side.App.SnapshotBuffer import SnapshotBuffer
 
 
 class Others(GameObject):
-    def __init__(self, x, y, username, width=50, height=50, color=(0, 255, 0), speed=20):
+    def __init__(self, x, y, username, width=50, height=50, color=(0, 255, 0), speed=20, interpolation_delay=0.1):
         super().__init__(x, y, width, height, color, username,  "../assets/police.png", 2)
         self.speed = speed
+        self.interpolation_delay = interpolation_delay  # Render this many seconds behind the newest snapshot
+        self.snapshots = SnapshotBuffer()
 
+    def add_snapshot(self, timestamp, x, y):
+        """Buffer a position received from the server at the given time.monotonic() timestamp."""
+        self.snapshots.add(timestamp, x, y)
 
-
+    def position_at(self, now):
+        """
+        Position to draw at the time.monotonic() time now, between buffered positions instead of the newest one.
+        None until a snapshot arrived.
+        """
+        return self.snapshots.sample(now - self.interpolation_delay)
@@ -0,0 +1,87 @@
+import hashlib
+import io
+import mmap
+import os
+import struct
+import pygame
+
+# Width and height of the image, at the start of every cache file
+HEADER = struct.Struct('<II')
+
+
+class PixelCache:
+    def __init__(self, cache_dir="../asset_cache"):
+        """
+        On-disk cache of decoded and scaled images as raw RGBA pixels, keyed by the hash of the
+        image file and the size it was scaled to. A cached image is mapped straight into a surface,
+        skipping the PNG decoding and the scaling of every launch after the first.
+        """
+        self.cache_dir = cache_dir
+        self.buffers = []  # Mapped cache files, kept open while surfaces use their pixels
+
+    def cache_path(self, digest, size):
+        """Cache file of an image, an image kept at its own size is found by its hash alone"""
+        name = f"{digest}_native" if size is None else f"{digest}_{size[0]}x{size[1]}"
+        return os.path.join(self.cache_dir, name + ".rgba")
+
+    def load(self, path, size=None):
+        """
+        Return the image at path scaled to size, or at its own size if size is None.
+        """
+        with open(path, 'rb') as file:
+            data = file.read()
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+
+        cached = self.cache_path(digest, size)
+        if os.path.exists(cached):
+            return self.map_pixels(cached)
+
+        image = pygame.image.load(io.BytesIO(data), path)
+        if size is not None and image.get_size() != tuple(size):
+            image = pygame.transform.scale(image, size)
+
+        self.save_pixels(image, cached)
+        return image
+
+    def map_pixels(self, cached):
+        """Make a surface that reads its pixels from the cache file, without copying them"""
+        with open(cached, 'rb') as file:
+            # Copy on write, drawing on the surface changes only this process's copy of a page
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        try:
+            width, height = HEADER.unpack_from(buffer, 0)
+        except struct.error:
+            buffer.close()
+            raise ValueError(f"Cached image {cached} is truncated")
+        if len(buffer) != HEADER.size + width * height * 4:
+            buffer.close()
+            raise ValueError(f"Cached image {cached} has the wrong size")
+        self.buffers.append(buffer)
+        return pygame.image.frombuffer(memoryview(buffer)[HEADER.size:], (width, height), "RGBA")
+
+    def save_pixels(self, image, cached):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{cached}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as file:
+                file.write(HEADER.pack(*image.get_size()))
+                file.write(pygame.image.tostring(image, "RGBA"))
+            os.replace(temp_path, cached)  # Another client never sees a half written file
+        except OSError as e:
+            print(f"Error caching image pixels: {e}")
+
+
+# Shared by every window and entity
+pixel_cache = PixelCache()
+
+
+def load_image(path, size=None):
+    """
+    Load an image through the pixel cache, falling back to decoding it if the cached copy is unusable.
+    """
+    try:
+        return pixel_cache.load(path, size)
+    except ValueError as e:
+        print(f"Ignoring the pixel cache: {e}")
+        image = pygame.image.load(path)
+        return pygame.transform.scale(image, size) if size is not None else image
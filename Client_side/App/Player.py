@@ -1,24 +1,50 @@
+from collections import deque
+
 from Client_side.App.GameObject import *
 
 
 class Player(GameObject):
-    def __init__(self, x, y, username, width=50, height=50, color=(0, 255, 0), speed=20):
+    def __init__(self, x, y, username, width=50, height=50, color=(0, 255, 0), speed=20, max_pending_inputs=256):
         super().__init__(x, y, width, height, color, username, "../assets/pig.png", 2)
         self.speed = speed
+        self.sequence = 0  # Sequence number of the last movement input
+        self.acked_sequence = 0  # Last input the server has confirmed
+        self.pending_inputs = deque(maxlen=max_pending_inputs)  # (sequence, dx, dy) not yet confirmed
+
+    def read_input(self):
+        """קריאת כיוון התנועה מהמקלדת"""
+        keys = pygame.key.get_pressed()
+        dx = (1 if keys[pygame.K_d] else 0) - (1 if keys[pygame.K_a] else 0)
+        dy = (1 if keys[pygame.K_s] else 0) - (1 if keys[pygame.K_w] else 0)
+        return dx, dy
+
+    def apply_input(self, dx, dy):
+        """הזזת השחקן לפי כיוון תנועה אחד"""
+        self.x += dx * self.speed
+        self.y += dy * self.speed
 
     def handle_input(self):
         """בדיקת קלט מהמקלדת והזזת השחקן בהתאם"""
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_a]:
-            self.x -= self.speed
-        if keys[pygame.K_d]:
-            self.x += self.speed
-        if keys[pygame.K_w]:
-            self.y -= self.speed
-        if keys[pygame.K_s]:
-            self.y += self.speed
+        dx, dy = self.read_input()
+        if dx or dy:
+            # Move right away and remember the input until the server confirms it
+            self.sequence += 1
+            self.apply_input(dx, dy)
+            self.pending_inputs.append((self.sequence, dx, dy))
+
+    def reconcile(self, acked_sequence, x, y):
+        """Apply the server's position for acked_sequence and replay the inputs it hasn't seen yet."""
+        if acked_sequence < self.acked_sequence or acked_sequence > self.sequence:
+            return  # Out of order reply, or state left over from an earlier session
+        self.acked_sequence = acked_sequence
+
+        while self.pending_inputs and self.pending_inputs[0][0] <= acked_sequence:
+            self.pending_inputs.popleft()
+
+        self.x, self.y = x, y
+        for _, dx, dy in self.pending_inputs:
+            self.apply_input(dx, dy)
 
     def update(self):
         """עדכון מצב השחקן (כולל קלט)"""
         self.handle_input()
-
@@ -0,0 +1,51 @@
+import numpy as np
+from Client_side.App.EntityStore import MAP, BUTTON, STORY, OTHERS, PLAYER
+
+# Layers from the bottom up, with the kind of entity drawn in each, overlays aren't entities
+LAYERS = (("map", MAP), ("stories", STORY), ("others", OTHERS), ("player", PLAYER), ("ui", BUTTON), ("overlays", None))
+
+
+class Overlay:
+    def __init__(self, draw):
+        """Something drawn on top of everything by a function, like the story preview."""
+        self.draw = draw
+
+    def render(self, screen, camera):
+        self.draw()
+
+
+class RenderQueue:
+    def __init__(self, store):
+        """
+        Draws a frame as one pass over the entities the camera sees, layer by layer.
+        Entities belong to the layer of their kind in the EntityStore, so they are registered once
+        when they are added to the store. Every layer can be turned off on its own.
+        """
+        self.store = store
+        self.enabled = {name: True for name, _ in LAYERS}
+        self.overlays = []  # Drawn last, in the order they were added
+        self.layer_of_kind = np.full(max(kind for _, kind in LAYERS if kind is not None) + 1, -1, np.int8)
+        self.update_layers()
+
+    def update_layers(self):
+        self.layer_of_kind[:] = -1
+        for layer, (name, kind) in enumerate(LAYERS):
+            if kind is not None and self.enabled[name]:
+                self.layer_of_kind[kind] = layer
+
+    def set_enabled(self, name, enabled):
+        """Show or hide a layer."""
+        self.enabled[name] = enabled
+        self.update_layers()
+
+    def add_overlay(self, overlay):
+        self.overlays.append(overlay)
+
+    def render(self, screen, camera, area=None):
+        """Draw the frame, or only the entities touching area, a part of the screen, when given."""
+        view = camera if area is None else area.move(camera.x, camera.y)
+        for entity in self.store.in_layers(view, self.layer_of_kind):
+            entity.render(screen, camera)
+        if self.enabled["overlays"]:
+            for overlay in self.overlays:
+                overlay.render(screen, camera)
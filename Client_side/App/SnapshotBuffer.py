@@ -0,0 +1,45 @@
+from collections import deque
+
+
+class SnapshotBuffer:
+    def __init__(self, max_snapshots=32, max_extrapolation=0.25):
+        """
+        Timestamped positions of a remote entity, sampled at a point in the past
+        so rendering can interpolate between two received snapshots.
+        """
+        self.snapshots = deque(maxlen=max_snapshots)  # (timestamp, x, y), oldest first
+        self.max_extrapolation = max_extrapolation  # Seconds to keep moving after the last snapshot
+
+    def add(self, timestamp, x, y):
+        """Add a snapshot, ignoring ones that arrive out of order."""
+        if self.snapshots and timestamp <= self.snapshots[-1][0]:
+            return
+        self.snapshots.append((timestamp, x, y))
+
+    def sample(self, render_time):
+        """Return the interpolated (x, y) at render_time, or None if the buffer is empty."""
+        if not self.snapshots:
+            return None
+
+        first_time, first_x, first_y = self.snapshots[0]
+        if render_time <= first_time:
+            return first_x, first_y
+
+        last_time, last_x, last_y = self.snapshots[-1]
+        if render_time >= last_time:
+            if len(self.snapshots) < 2:
+                return last_x, last_y
+            # Packets are late or lost, keep the last velocity for a short while
+            prev_time, prev_x, prev_y = self.snapshots[-2]
+            elapsed = min(render_time - last_time, self.max_extrapolation)
+            ratio = elapsed / (last_time - prev_time)
+            return last_x + (last_x - prev_x) * ratio, last_y + (last_y - prev_y) * ratio
+
+        # Walk back from the newest snapshot, render_time is usually close to the end
+        for index in range(len(self.snapshots) - 1, 0, -1):
+            before_time, before_x, before_y = self.snapshots[index - 1]
+            if before_time <= render_time:
+                after_time, after_x, after_y = self.snapshots[index]
+                ratio = (render_time - before_time) / (after_time - before_time)
+                return before_x + (after_x - before_x) * ratio, before_y + (after_y - before_y) * ratio
+        return first_x, first_y
@@ -0,0 +1,69 @@
+class SpatialHash:
+    def __init__(self, cell_size=256):
+        """
+        Uniform grid over world coordinates, mapping each cell to the entities whose rect touches it.
+        Finding the entities in an area only looks at the cells the area covers.
+        """
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> set of entities
+        self.rects = {}  # entity -> (rect, cells the rect touches)
+
+    def cells_for(self, rect):
+        first_column = rect.left // self.cell_size
+        last_column = (rect.right - 1) // self.cell_size
+        first_row = rect.top // self.cell_size
+        last_row = (rect.bottom - 1) // self.cell_size
+        return [(column, row) for column in range(first_column, last_column + 1)
+                for row in range(first_row, last_row + 1)]
+
+    def insert(self, entity, rect):
+        """Add an entity covering rect, or move it there if it is already in the grid."""
+        if entity in self.rects:
+            self.move(entity, rect)
+            return
+        cells = self.cells_for(rect)
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(entity)
+        self.rects[entity] = (rect.copy(), cells)
+
+    def remove(self, entity):
+        """Remove an entity, entities that aren't in the grid are ignored."""
+        if entity not in self.rects:
+            return
+        _, cells = self.rects.pop(entity)
+        for cell in cells:
+            bucket = self.cells[cell]
+            bucket.discard(entity)
+            if not bucket:
+                del self.cells[cell]
+
+    def move(self, entity, rect):
+        """Update the rect of an entity already in the grid."""
+        old_rect, cells = self.rects[entity]
+        if rect == old_rect:
+            return
+        new_cells = self.cells_for(rect)
+        if new_cells != cells:
+            self.remove(entity)
+            for cell in new_cells:
+                self.cells.setdefault(cell, set()).add(entity)
+        self.rects[entity] = (rect.copy(), new_cells)
+
+    def query(self, rect):
+        """Return the set of entities whose rect intersects rect."""
+        found = set()
+        for cell in self.cells_for(rect):
+            for entity in self.cells.get(cell, ()):
+                if entity not in found and self.rects[entity][0].colliderect(rect):
+                    found.add(entity)
+        return found
+
+    def clear(self):
+        self.cells.clear()
+        self.rects.clear()
+
+    def __iter__(self):
+        return iter(list(self.rects))
+
+    def __len__(self):
+        return len(self.rects)
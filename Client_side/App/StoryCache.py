@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+
+
+class StoryCache:
+    def __init__(self, server, db_path="../story_cache.db"):
+        """
+        On-disk copy of the server's stories so the map can be filled before the network answers.
+        The cache belongs to one server and one version of its story store.
+        """
+        self.server = server  # "host:port" the cached stories came from
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self.conn.execute('''
+                          CREATE TABLE IF NOT EXISTS stories (
+                              idx INTEGER PRIMARY KEY,
+                              title TEXT,
+                              content TEXT,
+                              username TEXT,
+                              pos_x INTEGER,
+                              pos_y INTEGER
+                          )
+                      ''')
+
+    def get_meta(self, key):
+        row = self.conn.execute('SELECT value FROM meta WHERE key=?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def load(self):
+        """
+        Return (version, titles, contents, usernames, pos_x, pos_y) for the cached stories,
+        or None if the cache is empty or belongs to another server.
+        """
+        with self.lock:
+            if self.get_meta('server') != self.server:
+                return None
+            version = self.get_meta('version')
+            rows = self.conn.execute(
+                'SELECT title, content, username, pos_x, pos_y FROM stories ORDER BY idx').fetchall()
+        if not rows:
+            return None
+        titles, contents, usernames, pos_x, pos_y = (list(column) for column in zip(*rows))
+        return version, titles, contents, usernames, pos_x, pos_y
+
+    def store(self, version, start, titles, contents, usernames, pos_x, pos_y):
+        """
+        Save stories received from the server, starting at story index start.
+        Anything cached from start onwards, or from another server or version, is replaced.
+        """
+        with self.lock, self.conn:
+            same_store = self.get_meta('server') == self.server and self.get_meta('version') == version
+            self.conn.execute('DELETE FROM stories WHERE idx >= ?', (start if same_store else 0,))
+            self.conn.executemany(
+                'INSERT INTO stories (idx, title, content, username, pos_x, pos_y) VALUES (?, ?, ?, ?, ?, ?)',
+                ((start + offset, *row) for offset, row in enumerate(zip(titles, contents, usernames, pos_x, pos_y)))
+            )
+            self.conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                                  [('server', self.server), ('version', version)])
+
+    def close(self):
+        self.conn.close()
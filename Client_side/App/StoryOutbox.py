@@ -0,0 +1,98 @@
+import sqlite3
+import threading
+import uuid
+
+
+class StoryOutbox(threading.Thread):
+    def __init__(self, client, db_path="../story_outbox.db", batch_size=20, retry_base_delay=1.0,
+                 retry_max_delay=30.0):
+        """
+        Stories written by the player, saved on disk right away and uploaded in the background.
+        Each story gets a key when it is written, the server stores a key only once,
+        so a batch can be sent again after a lost reply without creating duplicates.
+        The uploaded event is set after every batch the server acknowledged.
+        """
+        super().__init__(daemon=True)
+        self.client = client
+        self.batch_size = batch_size
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.running = True
+        self.wake = threading.Event()  # Set when a story is added, so it is uploaded without waiting
+        self.uploaded = threading.Event()  # Set when stories reached the server, cleared by whoever reloads them
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        with self.conn:
+            self.conn.execute('''
+                          CREATE TABLE IF NOT EXISTS outbox (
+                              seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                              key TEXT UNIQUE,
+                              title TEXT,
+                              content TEXT,
+                              username TEXT,
+                              pos_x INTEGER,
+                              pos_y INTEGER
+                          )
+                      ''')
+
+    def add(self, title, content, username, pos_x, pos_y):
+        """
+        Save a story for upload and return its key. Never waits on the network.
+        """
+        key = uuid.uuid4().hex
+        with self.lock, self.conn:
+            self.conn.execute('INSERT INTO outbox (key, title, content, username, pos_x, pos_y) VALUES (?, ?, ?, ?, ?, ?)',
+                              (key, title, content, username, int(pos_x), int(pos_y)))
+        self.wake.set()
+        return key
+
+    def pending(self):
+        """Return how many stories are still waiting to be uploaded."""
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def next_batch(self):
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT key, title, content, username, pos_x, pos_y FROM outbox ORDER BY seq LIMIT ?',
+                (self.batch_size,)).fetchall()
+        return [{"key": key, "title": title, "content": content, "username": username, "pos_x": pos_x, "pos_y": pos_y}
+                for key, title, content, username, pos_x, pos_y in rows]
+
+    def remove(self, keys):
+        with self.lock, self.conn:
+            self.conn.executemany('DELETE FROM outbox WHERE key=?', ((key,) for key in keys))
+
+    def run(self):
+        delay = self.retry_base_delay
+        while self.running:
+            batch = self.next_batch()
+            if not batch:
+                # Nothing to send, sleep until a story is added
+                self.wake.wait()
+                self.wake.clear()
+                continue
+
+            acked = self.client.add_stories(batch)
+            if acked:
+                self.remove(acked)
+                self.uploaded.set()
+                delay = self.retry_base_delay
+                continue
+
+            # Offline or the upload failed, the stories stay on disk until the next try
+            self.wake.wait(delay)
+            self.wake.clear()
+            delay = min(delay * 2, self.retry_max_delay)
+
+    def stop(self):
+        """
+        Stop uploading, stories that were not sent yet are uploaded on the next start.
+        """
+        self.running = False
+        self.wake.set()
+        if self.is_alive():
+            self.join(timeout=1)
+        if not self.is_alive():
+            self.conn.close()
@@ -1,5 +1,7 @@
 import pygame
 from Client_side.App.Button import Button  # Assuming the Button class is in Button.py
+from Client_side.App.AssetManager import assets
+from Client_side.App.DirtyRects import DirtyRects
 
 
 class StoryWindow:
@@ -9,18 +11,17 @@ class StoryWindow:
         self.window_height = screen.get_height()
         self.full_text = full_text
         self.font_path = font_path
-        self.font = pygame.font.Font(self.font_path, 32)
-        self.small_font = pygame.font.Font(self.font_path, 24)
-        from_font = pygame.font.Font(self.font_path, 26)
-        from_font.set_italic(True)  # Makes the font italic
-        title_font = pygame.font.Font(self.font_path, 40)
-        title_font.set_underline(True)  # Makes the font underlined
+        self.font = assets.font(self.font_path, 32)
+        self.small_font = assets.font(self.font_path, 24)
+        from_font = assets.font(self.font_path, 26, italic=True)  # Makes the font italic
+        title_font = assets.font(self.font_path, 40, underline=True)  # Makes the font underlined
         self.wrapped_text = self.wrap_text(full_text, self.font, from_font, title_font)
         self.scroll_y = 200  # Start further down for centering
+        self.dirty = DirtyRects(screen.get_rect())  # Parts of the window to redraw, nothing while idle
+        self.clock = pygame.time.Clock()
 
         # Load the background image
-        self.bg_image = pygame.image.load(bg_image_path)
-        self.bg_image = pygame.transform.scale(self.bg_image, (self.window_width, self.window_height))  # Scale it to fit the screen
+        self.bg_image = assets.image(bg_image_path, (self.window_width, self.window_height))  # Scaled to fit the screen
 
         # Create the back button using the Button class
         self.back_button = Button(
@@ -81,15 +82,25 @@ class StoryWindow:
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_DOWN:
                     self.scroll_y -= 40
+                    self.dirty.mark_all()
                 elif event.key == pygame.K_UP:
                     self.scroll_y += 40
+                    self.dirty.mark_all()
+            elif event.type == pygame.MOUSEMOTION:
+                self.dirty.mark(self.back_button.get_render_rect())  # The button may change its hover color
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.dirty.mark_all()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if self.back_button.on_click(event.pos):
                     return False  # Close the story window
         return True
 
     def render(self, screen):
-        """Render the story window with the text and the back button."""
+        """Redraw the parts of the story window that changed."""
+        self.dirty.draw(screen, lambda area: self.draw(screen))
+
+    def draw(self, screen):
+        """Draw the story window with the text and the back button."""
         screen.fill((255, 255, 255))
 
         # Draw the background image
@@ -98,7 +109,7 @@ class StoryWindow:
         # Draw story text (centered)
         y = self.scroll_y
         for line, line_font in self.wrapped_text:  # Unpack the line and its corresponding font
-            text_surface = line_font.render(line, True, (69, 78, 48))  # Use the correct font for each line
+            text_surface = assets.text(line_font, line, (69, 78, 48))  # Use the correct font for each line
             text_x = (self.window_width - text_surface.get_width()) // 2  # Center the text
             screen.blit(text_surface, (text_x, y))
             y += text_surface.get_height() + 10
@@ -111,8 +122,6 @@ class StoryWindow:
         # Render the back button
         self.back_button.render(screen)
 
-        pygame.display.flip()
-
     def run(self, screen):
         """Run the story window in a loop until closed by user."""
         running = True
@@ -120,3 +129,4 @@ class StoryWindow:
         while running:
             running = self.handle_events()
             self.render(screen)
+            self.clock.tick(60)
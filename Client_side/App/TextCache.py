@@ -0,0 +1,46 @@
+from collections import OrderedDict
+
+
+class TextCache:
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        """
+        Least recently used cache of rendered text surfaces, so text that doesn't change
+        is rasterized once instead of every frame. Evicts the oldest surfaces once they
+        take more than max_bytes.
+        """
+        self.max_bytes = max_bytes
+        self.surfaces = OrderedDict()  # (font, text, color, antialias) -> surface, least recently used first
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        """
+        Return font.render(text, antialias, color), rendering it only on a miss.
+        Fonts come from the AssetManager, so the font object stands for its file, size and style.
+        The surface is shared and must not be drawn on.
+        """
+        key = (font, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        self.size_bytes += surface.get_width() * surface.get_height() * surface.get_bytesize()
+        while self.size_bytes > self.max_bytes and len(self.surfaces) > 1:
+            _, evicted = self.surfaces.popitem(last=False)
+            self.size_bytes -= evicted.get_width() * evicted.get_height() * evicted.get_bytesize()
+        return surface
+
+    def hit_rate(self):
+        """Share of render calls answered from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"entries": len(self.surfaces), "bytes": self.size_bytes, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hit_rate()}
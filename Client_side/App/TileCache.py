@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+
+class TileCache:
+    def __init__(self, budget_bytes=16 * 1024 * 1024):
+        """
+        Least recently used cache of decoded map tiles, evicting the oldest ones
+        once their pixels take more than budget_bytes.
+        """
+        self.budget_bytes = budget_bytes
+        self.tiles = OrderedDict()  # key -> surface, least recently used first
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def surface_bytes(surface):
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+    def get(self, key, load):
+        """
+        Return the tile stored under key, calling load() to decode it on a miss.
+        """
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+
+        self.misses += 1
+        tile = load()
+        self.tiles[key] = tile
+        self.size_bytes += self.surface_bytes(tile)
+
+        # Never evict the tile just loaded, a budget smaller than one tile still draws it
+        while self.size_bytes > self.budget_bytes and len(self.tiles) > 1:
+            _, evicted = self.tiles.popitem(last=False)
+            self.size_bytes -= self.surface_bytes(evicted)
+        return tile
+
+    def clear(self):
+        self.tiles.clear()
+        self.size_bytes = 0
@@ -1,7 +1,10 @@
 class User:
-    def __init__(self, username, pos_x, pos_y):
+    def __init__(self, username, pos_x, pos_y, last_sequence=0, vel_x=0, vel_y=0):
         self.username = username
         self.pos_x = pos_x
         self.pos_y = pos_y
+        self.last_sequence = last_sequence  # Last movement input applied to this position
+        self.vel_x = vel_x  # Velocity in pixels per second, used for dead reckoning
+        self.vel_y = vel_y
     def print_all_users(self):
-        print(self.username, self.pos_x, self.pos_y)
\ No newline at end of file
+        print(self.username, self.pos_x, self.pos_y)
@@ -6,12 +6,17 @@ from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import serialization
 from Client_side import Engine
-from Client_side.App.User import User
+from Client_side import Framing
+from Client_side import Packets
+from Client_side.NetworkThread import NetworkThread
 import threading
+import random
+import time
 
 
 class Client:
-    def __init__(self, server_host='192.168.1.212', tcp_port=65432, udp_port=12345):
+    def __init__(self, server_host='192.168.1.212', tcp_port=65432, udp_port=12345,
+                 reconnect_base_delay=0.5, reconnect_max_delay=30.0, tcp_timeout=10.0):
         """
         Initialize the Client by generating keys, connecting to the server,
         and starting the application engine.
@@ -20,6 +25,18 @@ class Client:
         self.tcp_port = tcp_port
         self.udp_port = udp_port
         self.running = False
+        self.network = None  # Background UDP thread, started when the game starts
+        self.send_buffer = bytearray(Packets.UPDATE.size + Packets.MAX_NAME)  # Reused for every position update
+        self.encoded_username = b''
+        self.username = None
+        self.credentials = None  # Kept in memory to restore the session after a reconnect
+        self.connected = False
+        self.closing = False
+        self.reconnect_thread = None
+        self.reconnect_base_delay = reconnect_base_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.tcp_timeout = tcp_timeout  # A silent server counts as a lost connection after this many seconds
+        self.tcp_lock = threading.RLock()  # One request/response exchange on the TCP socket at a time
         # Generate RSA keys
         self.private_key, self.public_key = self.make_keys()
         self.public_key_pem = self.public_key.public_bytes(
@@ -28,24 +45,15 @@ class Client:
         )
 
         # Create TCP socket
-        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         try:
-            self.client_socket.connect((server_host, tcp_port))
-            print(f"Connected to server at {server_host}:{tcp_port}")
-
-            self.client_socket.send(self.public_key_pem)
-            public_server_key_pem = self.client_socket.recv(1024)
-            self.public_server_key = load_pem_public_key(public_server_key_pem)
-
-            self.username = None
+            self.connect()
         except Exception as e:
             print(f"Failed to connect to server: {e}")
-            self.client_socket.close()
             raise
 
         # Create UDP socket
         try:
-            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp_socket = self.make_udp_socket()
             print(f"UDP server listening on {server_host}:{udp_port}...")
         except Exception as e:
             print(f"Failed to connect to server: {e}")
@@ -54,6 +62,74 @@ class Client:
         # Initialize the application engine
         self.app_engine = Engine.AppEngine(self)
 
+    def connect(self):
+        """
+        Open the TCP connection and exchange public keys with the server.
+        """
+        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        client_socket.settimeout(self.tcp_timeout)
+        try:
+            client_socket.connect((self.server_host, self.tcp_port))
+            print(f"Connected to server at {self.server_host}:{self.tcp_port}")
+
+            client_socket.send(self.public_key_pem)
+            public_server_key_pem = client_socket.recv(1024)
+            self.public_server_key = load_pem_public_key(public_server_key_pem)
+        except Exception:
+            client_socket.close()
+            raise
+
+        with self.tcp_lock:
+            self.client_socket = client_socket
+            self.connected = True
+
+    def connection_lost(self, error):
+        """
+        Mark the TCP connection as dead and start reconnecting in the background.
+        Requests made in the meantime return right away, the game keeps running on cached state.
+        """
+        print(f"Server connection lost: {error}")
+        with self.tcp_lock:
+            if not self.connected:
+                return
+            self.connected = False
+            try:
+                self.client_socket.close()
+            except OSError:
+                pass
+        self.start_reconnect()
+
+    def start_reconnect(self):
+        if self.closing or (self.reconnect_thread is not None and self.reconnect_thread.is_alive()):
+            return
+        self.reconnect_thread = threading.Thread(target=self.reconnect_loop)
+        self.reconnect_thread.daemon = True
+        self.reconnect_thread.start()
+
+    def reconnect_loop(self):
+        """
+        Reconnect with jittered exponential backoff, then log back in with the saved credentials.
+        """
+        attempt = 0
+        while not self.closing:
+            # Full jitter keeps a crowd of clients from reconnecting in lockstep after a server restart
+            delay = min(self.reconnect_max_delay, self.reconnect_base_delay * 2 ** attempt)
+            time.sleep(random.uniform(0, delay))
+            attempt += 1
+            try:
+                self.connect()
+            except Exception as e:
+                print(f"Reconnect attempt {attempt} failed: {e}")
+                continue
+
+            if self.credentials and not self.log_in(*self.credentials):
+                if not self.connected:
+                    continue  # Lost the connection again while logging in
+                print("Session could not be restored, please log in again.")
+                self.running = False
+            print(f"Reconnected after {attempt} attempt(s).")
+            return
+
     def make_keys(self):
         private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
         public_key = private_key.public_key()
@@ -70,145 +146,218 @@ class Client:
         )
 
     def log_in(self, login_username, login_password):
+        if not self.connected:
+            print("Not connected to the server.")
+            return False
         try:
-            self.client_socket.send(b'login')
-            response = self.client_socket.recv(1024).decode('utf-8')
-            credentials = f"{login_username},{login_password}"
-            self.client_socket.send(self.encrypt(credentials))
-            response = self.client_socket.recv(1024).decode('utf-8')
+            with self.tcp_lock:
+                self.client_socket.send(b'login')
+                response = self.client_socket.recv(1024).decode('utf-8')
+                credentials = f"{login_username},{login_password}"
+                self.client_socket.send(self.encrypt(credentials))
+                response = self.client_socket.recv(1024).decode('utf-8')
             if response == 'True':
                 print("Login successful!")
                 self.username = login_username
+                self.encoded_username = login_username.encode('utf-8')[:Packets.MAX_NAME]
+                self.credentials = (login_username, login_password)
                 self.running = True
                 return True
             else:
                 print("Login failed!")
                 return False
+        except (socket.error, ConnectionResetError) as e:
+            self.connection_lost(e)
+            return False
         except Exception as e:
             print(f"Error during login: {e}")
             return False
-        except (socket.error, ConnectionResetError) as e:
-            print(f"Server connection lost: {e}")
-            self.cleanup_and_disconnect()
 
     def register(self, user_name, username, password):
+        if not self.connected:
+            print("Not connected to the server.")
+            return
         try:
-            self.client_socket.send(b'register')
-            response = self.client_socket.recv(1024).decode('utf-8')
-            user_data = f"{user_name},{username},{password}"
-            self.client_socket.send(self.encrypt(user_data))
-            response = self.client_socket.recv(1024).decode('utf-8')
+            with self.tcp_lock:
+                self.client_socket.send(b'register')
+                response = self.client_socket.recv(1024).decode('utf-8')
+                user_data = f"{user_name},{username},{password}"
+                self.client_socket.send(self.encrypt(user_data))
+                response = self.client_socket.recv(1024).decode('utf-8')
             print(response)
+        except (socket.error, ConnectionResetError) as e:
+            self.connection_lost(e)
         except Exception as e:
             print(f"Error during registration: {e}")
-        except (socket.error, ConnectionResetError) as e:
-            print(f"Server connection lost: {e}")
-            self.cleanup_and_disconnect()
 
-    def receive_stories(self):
+    def username_available(self, username):
+        if not self.connected:
+            return None
         try:
-            # Send request to receive stories
-            self.client_socket.send(b'receive_stories')
-            response = self.client_socket.recv(1024).decode('utf-8')
-
-            # Receive data from server
-
-
-            data = self.client_socket.recv(4096)
-
-
-            # Decode and parse JSON
-            json_data = data.decode('utf-8')
-            stories_data = json.loads(json_data)
-
-            # Extract data into arrays
-            titles = stories_data.get('titles', [])
-            contents = stories_data.get('contents', [])
-            usernames = stories_data.get('usernames', [])
-            pos_x = stories_data.get('pos_x', [])
-            pos_y = stories_data.get('pos_y', [])
-
-            # Print received data
-            print("Received titles:", titles)
-            print("Received contents:", contents)
-            print("Received usernames:", usernames)
-            print("Received pos_x:", pos_x)
-            print("Received pos_y:", pos_y)
-
-            # Return extracted data
-            return titles, contents, usernames, pos_x, pos_y
+            with self.tcp_lock:
+                self.client_socket.send(b'username_available')
+                response = self.client_socket.recv(1024).decode('utf-8')
+                self.client_socket.send(username.encode('utf-8'))
+                response = self.client_socket.recv(1024).decode('utf-8')
+            return response == 'True'
         except (socket.error, ConnectionResetError) as e:
-            print(f"Server connection lost: {e}")
-            self.cleanup_and_disconnect()
+            self.connection_lost(e)
+            return None
+        except Exception as e:
+            print(f"Error checking username: {e}")
+            return None
 
-    def send_player_data(self, pos_x, pos_y):
+    def stream_stories(self, since=0, version=None):
+        """
+        Stream the stories the server stored from index since onwards, where version is the
+        store the first since stories came from. The first item yielded is (version, start, total),
+        where start may be lower than since if the server's story store changed, followed by one
+        (title, content, username, pos_x, pos_y) per story as its frame arrives.
+        Yields nothing while disconnected, and stops early if the connection drops.
+        The TCP connection is held until the generator is exhausted or closed.
+        """
+        if not self.connected:
+            return
+        finished = False
+        with self.tcp_lock:
+            try:
+                # Send request to receive stories, followed by the cursor of stories we already have
+                self.client_socket.send(b'receive_stories')
+                response = self.client_socket.recv(1024).decode('utf-8')
+                self.client_socket.send(f"{since},{version or ''}".encode('utf-8'))
+
+                header = Framing.recv_json(self.client_socket)
+                yield header.get('version'), header.get('since', 0), header.get('total', 0)
+
+                # Stories come in small frames until an empty one, each frame is decoded on its own
+                while True:
+                    frame = Framing.recv_frame(self.client_socket)
+                    if not frame:
+                        finished = True
+                        break
+                    for story in json.loads(frame.decode('utf-8')):
+                        yield tuple(story)
+            except (socket.error, ConnectionResetError, ValueError) as e:
+                finished = True
+                self.connection_lost(e)
+            finally:
+                if not finished:
+                    # Closed halfway, the rest of the stream is still on the socket, start over on a new connection
+                    self.connection_lost("story stream closed before the end")
+
+    def receive_stories(self, since=0, version=None):
+        """
+        Receive the stories the server stored from index since onwards, all at once.
+        Returns (version, start, total, titles, contents, usernames, pos_x, pos_y), see stream_stories,
+        or None while disconnected.
+        """
+        stream = self.stream_stories(since, version)
+        header = next(stream, None)
+        if header is None:
+            return None
+        version, start, total = header
+        titles, contents, usernames, pos_x, pos_y = [], [], [], [], []
+        for title, content, username, x, y in stream:
+            titles.append(title)
+            contents.append(content)
+            usernames.append(username)
+            pos_x.append(x)
+            pos_y.append(y)
+        return version, start, total, titles, contents, usernames, pos_x, pos_y
+
+    def search_stories(self, query, limit=10):
+        if not self.connected:
+            return None
+        try:
+            with self.tcp_lock:
+                self.client_socket.send(b'search_stories')
+                response = self.client_socket.recv(1024).decode('utf-8')
+                Framing.send_json(self.client_socket, {"query": query, "limit": limit})
+                results = Framing.recv_json(self.client_socket).get('results', [])
+            print(f"Received {len(results)} search results for: {query}")
+            return results
+        except (socket.error, ConnectionResetError) as e:
+            self.connection_lost(e)
 
-        # Send a message indicating that player data will be sent
+    def nearest_stories(self, pos_x, pos_y, k=5):
+        if not self.connected:
+            return None
         try:
-            # Prepare the data to send (username, pos_x, pos_y)
-            player_data = {
-                "action": "send_player_data",
-                "username": self.username,
-                "pos_x": pos_x,
-                "pos_y": pos_y
-            }
-
-            # Convert the data to JSON and send it to the server
-            data_to_send = json.dumps(player_data)
-            self.udp_socket.sendto(data_to_send.encode('utf-8'), (self.server_host, self.udp_port))
-            print(f"Sent player data to server: {player_data}\n")
-
-            # Wait for the server's response (list of all players)
-            data, _ = self.udp_socket.recvfrom(1024)
-
-            # Decode and parse the server's response safely
-
-            response = json.loads(data.decode('utf-8'))
-            # Assuming the response contains the number of players and the list of users
-            num_players = response.get('num_players', 0)  # Default to 0 if 'num_players' is not in the response
-            print(f"Received server response: {response}")
-
-            # Extract players' information safely
-            users_db = response.get('players', [])
-            users = []
-            for user in users_db:
-                username = user.get('username', 'Unknown')  # Default to 'Unknown' if username is not found
-                pos_x = user.get('pos_x', 0)  # Default to 0 if pos_x is not found
-                pos_y = user.get('pos_y', 0)  # Default to 0 if pos_y is not found
-                print(f"Username: {username}, Position: ({pos_x}, {pos_y})")
-                users.append(User(username, pos_x, pos_y))
-
-            return num_players, users
+            with self.tcp_lock:
+                self.client_socket.send(b'nearest_stories')
+                response = self.client_socket.recv(1024).decode('utf-8')
+                Framing.send_json(self.client_socket, {"pos_x": pos_x, "pos_y": pos_y, "k": k})
+                results = Framing.recv_json(self.client_socket).get('results', [])
+            print(f"Received {len(results)} stories near ({pos_x}, {pos_y})")
+            return results
         except (socket.error, ConnectionResetError) as e:
-            print(f"Server connection lost: {e}")
-            self.cleanup_and_disconnect()
+            self.connection_lost(e)
+
+    @staticmethod
+    def make_udp_socket():
+        """
+        Open the UDP socket bound to a free local port, so the network thread can receive on it before
+        the first position is sent (Windows refuses to receive on an unbound socket).
+        """
+        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp_socket.bind(('', 0))
+        return udp_socket
+
+    def start_network(self):
+        """
+        Start the background thread that exchanges player positions with the server.
+        """
+        if self.network is None or not self.network.is_alive():
+            if self.udp_socket.fileno() == -1:
+                # The socket is closed on logout, open a fresh one for the next session
+                self.udp_socket = self.make_udp_socket()
+            self.network = NetworkThread(self)
+            self.network.start()
+        return self.network
+
+    def stop_network(self):
+        if self.network is not None:
+            self.network.stop()
+            self.network = None
+
+    def send_player_position(self, pos_x, pos_y, sequence=0, vel_x=0, vel_y=0):
+        # Pack the username, position, last input sequence and velocity into the reusable send buffer
+        size = Packets.pack_update(self.send_buffer, self.encoded_username, sequence, pos_x, pos_y, vel_x, vel_y)
+        self.udp_socket.sendto(memoryview(self.send_buffer)[:size], (self.server_host, self.udp_port))
 
     def logout(self):
+        # Stop the position exchange before the socket is used for the logout reply
+        self.stop_network()
+        # Logging out ends the session, it must not be restored by a reconnect
+        self.credentials = None
         try:
-            # Send logout request over TCP to the server
-            self.client_socket.send(b'logout')
-            response = self.client_socket.recv(1024).decode('utf-8')
-
-            # Send the username over TCP for the server to process
-            self.client_socket.send(self.username.encode('utf-8'))
-            response = self.client_socket.recv(1024).decode('utf-8')
-            print(response)
+            if self.connected:
+                with self.tcp_lock:
+                    # Send logout request over TCP to the server
+                    self.client_socket.send(b'logout')
+                    response = self.client_socket.recv(1024).decode('utf-8')
+
+                    # Send the username over TCP for the server to process
+                    self.client_socket.send(self.username.encode('utf-8'))
+                    response = self.client_socket.recv(1024).decode('utf-8')
+                    print(response)
+
+                    # The server closes the connection after a logout, open a new one for the next login
+                    self.connected = False
+                    self.client_socket.close()
+                self.start_reconnect()
 
             # Notify the server via UDP that the client is logging out
-            logout_message = {
-                "action": "logout",
-                "username": self.username
-            }
-            data_to_send = json.dumps(logout_message)
-            self.udp_socket.sendto(data_to_send.encode('utf-8'), (self.server_host, self.udp_port))
-            print(f"Sent logout message to server via UDP: {logout_message}")
-            response, _ = self.udp_socket.recvfrom(1024)
-            print(response)
+            self.udp_socket.sendto(Packets.pack_logout(self.encoded_username), (self.server_host, self.udp_port))
+            print(f"Sent logout message to server via UDP for {self.username}")
+            # Snapshots may still be on the way, wait for the logout reply itself
+            self.udp_socket.settimeout(1.0)
+            response, _ = self.udp_socket.recvfrom(Packets.MAX_DATAGRAM)
+            while response[:1] != bytes([Packets.LOGOUT_REPLY]):
+                response, _ = self.udp_socket.recvfrom(Packets.MAX_DATAGRAM)
+            print(response[1:].decode('utf-8'))
         except Exception as e:
             print(f"Error during logout: {e}")
-        except (socket.error, ConnectionResetError) as e:
-            print(f"Server connection lost: {e}")
-            self.cleanup_and_disconnect()
         finally:
             # Close the UDP socket and TCP socket
             self.udp_socket.close()
@@ -218,40 +367,54 @@ class Client:
         return self.username
 
     def add_story(self, title, content, username, pos_x, pos_y):
+        if not self.connected:
+            print("Not connected to the server, story was not sent.")
+            return
         try:
-            self.client_socket.send(b'add_story')
-            response = self.client_socket.recv(1024).decode('utf-8')
-            self.client_socket.send(title.encode())
-            self.client_socket.recv(1024)
-            self.client_socket.send(content.encode())
-            self.client_socket.recv(1024)
-            self.client_socket.send(username.encode())
-            self.client_socket.recv(1024)
-            self.client_socket.send(str(pos_x).encode())
-            self.client_socket.recv(1024)
-            self.client_socket.send(str(pos_y).encode())
-            response = self.client_socket.recv(1024).decode('utf-8')
+            with self.tcp_lock:
+                self.client_socket.send(b'add_story')
+                response = self.client_socket.recv(1024).decode('utf-8')
+                self.client_socket.send(title.encode())
+                self.client_socket.recv(1024)
+                self.client_socket.send(content.encode())
+                self.client_socket.recv(1024)
+                self.client_socket.send(username.encode())
+                self.client_socket.recv(1024)
+                self.client_socket.send(str(pos_x).encode())
+                self.client_socket.recv(1024)
+                self.client_socket.send(str(pos_y).encode())
+                response = self.client_socket.recv(1024).decode('utf-8')
             print(response)
+        except (socket.error, ConnectionResetError) as e:
+            self.connection_lost(e)
         except Exception as e:
             print(f"Error adding story: {e}")
-        except (socket.error, ConnectionResetError) as e:
-            print(f"Server connection lost: {e}")
-            self.cleanup_and_disconnect()
 
-    def cleanup_and_disconnect(self):
+    def add_stories(self, stories):
+        """
+        Upload a batch of story dicts (key, title, content, username, pos_x, pos_y).
+        Returns the keys the server acknowledged, or None if the batch has to be retried.
+        """
+        if not self.connected:
+            return None
         try:
-            self.running = False
-            # Send a logout message if possible (to notify the server)
-            if self.username:
-                self.logout()
-
-            # Close both TCP and UDP sockets
-            self.client_socket.close()
-            self.udp_socket.close()
-            print("Client disconnected and resources cleaned up.")
-            exit()
-        except Exception as e:
-            print(f"Error during cleanup: {e}")
+            with self.tcp_lock:
+                self.client_socket.send(b'add_stories')
+                response = self.client_socket.recv(1024).decode('utf-8')
+                Framing.send_json(self.client_socket, {"stories": stories})
+                reply = Framing.recv_json(self.client_socket)
+            print(f"Uploaded {len(stories)} stories, {reply.get('added', 0)} new")
+            return reply.get('acked', [])
+        except (socket.error, ConnectionResetError, ValueError) as e:
+            self.connection_lost(e)
+
+    def close(self):
+        """
+        Log out for good when the application shuts down, without reconnecting afterwards.
+        """
+        self.closing = True  # Stop any reconnect attempts, including the one logout would start
+        self.running = False
+        self.logout()
 
 # Main entry point
 if __name__ == "__main__":
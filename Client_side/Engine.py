@@ -31,12 +31,12 @@ class AppEngine:
                 state = App.App(self.window, self.status, self.client)
 
         except Exception as e:
-            self.client.logout()
+            self.client.close()
             exit(1)
         self.update_state()
 
     def exit(self):
-        self.client.logout()
+        self.client.close()
         self.window.quit()
         print("exit successfully...")
         exit()
@@ -0,0 +1,52 @@
+import json
+import struct
+
+# Every frame starts with its payload length as a 4-byte big-endian unsigned integer
+HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+def recv_exact(sock, size):
+    """
+    Read exactly size bytes from a TCP socket.
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if count == 0:
+            raise ConnectionResetError("Connection closed while reading a frame")
+        received += count
+    return bytes(buffer)
+
+
+def send_frame(sock, payload):
+    """
+    Send one length-prefixed frame.
+    """
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def recv_frame(sock):
+    """
+    Receive one length-prefixed frame and return its payload.
+    """
+    (size,) = HEADER.unpack(recv_exact(sock, HEADER.size))
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    return recv_exact(sock, size) if size else b''
+
+
+def send_json(sock, data):
+    """
+    Send a JSON-serializable object as a single frame.
+    """
+    send_frame(sock, json.dumps(data).encode('utf-8'))
+
+
+def recv_json(sock):
+    """
+    Receive a single frame and decode it as JSON.
+    """
+    return json.loads(recv_frame(sock).decode('utf-8'))
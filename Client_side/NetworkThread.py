@@ -0,0 +1,114 @@
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from Client_side.SendPolicy import SendPolicy
+from Client_side import Packets
+
+
+class NetworkThread(threading.Thread):
+    def __init__(self, client, send_rate=20, send_policy=None, max_extrapolation=1.0):
+        """
+        Exchange player positions with the server off the render loop.
+        The latest local position is checked at a fixed rate and sent when the send policy
+        asks for it; every received snapshot replaces the previous one in a lock-protected slot.
+        """
+        super().__init__(daemon=True)
+        self.client = client
+        self.send_interval = 1 / send_rate
+        self.send_policy = send_policy or SendPolicy()
+        self.max_extrapolation = max_extrapolation  # Cap for dead reckoning other players' positions
+        self.lock = threading.Lock()
+        self.running = True
+
+        self.position = None  # Latest (pos_x, pos_y, sequence) set by the render loop
+
+        # Datagrams are received into one buffer and parsed into the back snapshot,
+        # which is swapped with the front one the render loop reads
+        self.buffer = bytearray(Packets.MAX_DATAGRAM)
+        self.front = Packets.PlayerSnapshot()
+        self.back = Packets.PlayerSnapshot()
+        self.snapshot_id = 0
+
+    def set_position(self, pos_x, pos_y, sequence=0):
+        """
+        Store the position, and the input sequence that produced it, to send with the next update.
+        Never blocks on the network.
+        """
+        with self.lock:
+            self.position = (pos_x, pos_y, sequence)
+
+    @contextmanager
+    def latest_snapshot(self):
+        """
+        Give the render loop the latest PlayerSnapshot, or None if nothing was received yet.
+        The snapshot is only valid inside the with block, the thread won't swap it meanwhile.
+        """
+        with self.lock:
+            yield self.front if self.front.snapshot_id else None
+
+    def run(self):
+        next_send = time.monotonic()
+        while self.running:
+            now = time.monotonic()
+            if now >= next_send:
+                with self.lock:
+                    position = self.position
+                if position is not None and self.send_policy.should_send(now, position[0], position[1]):
+                    self.send(now, position)
+                # Don't try to catch up on missed sends after a stall
+                next_send = max(next_send + self.send_interval, now)
+
+            # Wait for snapshots until the next send is due
+            self.client.udp_socket.settimeout(max(next_send - time.monotonic(), 0.001))
+            try:
+                size, _ = self.client.udp_socket.recvfrom_into(self.buffer)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if not self.running:
+                    break
+                print(f"Error receiving player data: {e}")
+                continue
+
+            if size == 0 or self.buffer[0] != Packets.SNAPSHOT:
+                continue
+            try:
+                self.back.read(self.buffer, size)
+            except ValueError as e:
+                print(f"Ignoring malformed player data: {e}")
+                continue
+            self.dead_reckon(self.back)
+
+            self.snapshot_id += 1
+            self.back.snapshot_id = self.snapshot_id
+            self.back.received_at = time.monotonic()
+            with self.lock:
+                self.front, self.back = self.back, self.front
+
+    def dead_reckon(self, snapshot):
+        """
+        Other players only send when they change direction, move them along their last velocity.
+        The local player's record is left as the server stored it, for reconciliation.
+        """
+        for index in range(snapshot.count):
+            if snapshot.usernames[index] != self.client.username:
+                age = min(snapshot.ages[index], self.max_extrapolation)
+                snapshot.pos_x[index] += snapshot.vel_x[index] * age
+                snapshot.pos_y[index] += snapshot.vel_y[index] * age
+
+    def send(self, now, position):
+        pos_x, pos_y, sequence = position
+        vel_x, vel_y = self.send_policy.sent(now, pos_x, pos_y)
+        try:
+            self.client.send_player_position(pos_x, pos_y, sequence, vel_x, vel_y)
+        except OSError as e:
+            print(f"Error sending player data: {e}")
+
+    def stop(self):
+        """
+        Stop the thread and wait for it to leave its receive loop.
+        """
+        self.running = False
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=1)
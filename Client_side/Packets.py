@@ -0,0 +1,126 @@
+import struct
+from array import array
+
+# UDP packet types, always the first byte of a datagram
+PLAYER_UPDATE = 1
+LOGOUT = 2
+SNAPSHOT = 3
+LOGOUT_REPLY = 4
+
+MAX_DATAGRAM = 65507
+MAX_NAME = 255
+
+# type, input sequence, pos_x, pos_y, vel_x, vel_y, username length, followed by the username
+UPDATE = struct.Struct('!BIiiffB')
+# type, username length, followed by the username
+LOGOUT_HEADER = struct.Struct('!BB')
+# type, number of player records
+SNAPSHOT_HEADER = struct.Struct('!BH')
+# input sequence, pos_x, pos_y, vel_x, vel_y, age in milliseconds, username length, followed by the username
+RECORD = struct.Struct('!IiiffHB')
+
+
+def pack_update(buffer, username, sequence, pos_x, pos_y, vel_x, vel_y):
+    """
+    Write a player update into buffer and return its size. username is already utf-8 encoded.
+    """
+    UPDATE.pack_into(buffer, 0, PLAYER_UPDATE, sequence, round(pos_x), round(pos_y), vel_x, vel_y, len(username))
+    end = UPDATE.size + len(username)
+    buffer[UPDATE.size:end] = username
+    return end
+
+
+def pack_logout(username):
+    return LOGOUT_HEADER.pack(LOGOUT, len(username)) + username
+
+
+def pack_snapshot(buffer, records):
+    """
+    Write (username, sequence, pos_x, pos_y, vel_x, vel_y, age) records into buffer and return the size.
+    Usernames are already utf-8 encoded; records that don't fit in one datagram are left out.
+    """
+    offset = SNAPSHOT_HEADER.size
+    count = 0
+    for username, sequence, pos_x, pos_y, vel_x, vel_y, age in records:
+        end = offset + RECORD.size + len(username)
+        if end > len(buffer) or count == 0xFFFF:
+            break
+        RECORD.pack_into(buffer, offset, sequence, round(pos_x), round(pos_y), vel_x, vel_y,
+                         min(int(age * 1000), 0xFFFF), len(username))
+        buffer[offset + RECORD.size:end] = username
+        offset = end
+        count += 1
+    SNAPSHOT_HEADER.pack_into(buffer, 0, SNAPSHOT, count)
+    return offset
+
+
+def read_name(view, offset, length):
+    """
+    Decode a username straight out of a receive buffer.
+    """
+    return str(view[offset:offset + length], 'utf-8')
+
+
+class PlayerSnapshot:
+    def __init__(self, capacity=64):
+        """
+        Reusable columns for the player records of one snapshot, filled in place from a receive buffer.
+        """
+        self.snapshot_id = 0
+        self.received_at = 0.0
+        self.count = 0
+        self.capacity = 0
+        self.usernames = []
+        self.sequences = array('I')
+        self.pos_x = array('d')
+        self.pos_y = array('d')
+        self.vel_x = array('d')
+        self.vel_y = array('d')
+        self.ages = array('d')  # Seconds since the server received each position
+        self.reserve(capacity)
+
+    def reserve(self, capacity):
+        """Grow the columns so they can hold capacity records."""
+        if capacity <= self.capacity:
+            return
+        extra = capacity - self.capacity
+        self.usernames.extend([''] * extra)
+        self.sequences.extend([0] * extra)
+        for column in (self.pos_x, self.pos_y, self.vel_x, self.vel_y, self.ages):
+            column.extend([0.0] * extra)
+        self.capacity = capacity
+
+    def read(self, buffer, size):
+        """
+        Parse a SNAPSHOT datagram of the given size from buffer into the columns.
+        Raises ValueError if the datagram is malformed.
+        """
+        view = memoryview(buffer)
+        try:
+            packet_type, count = SNAPSHOT_HEADER.unpack_from(buffer, 0)
+            if packet_type != SNAPSHOT:
+                raise ValueError(f"unexpected packet type {packet_type}")
+            self.reserve(count)
+
+            offset = SNAPSHOT_HEADER.size
+            for index in range(count):
+                if offset + RECORD.size > size:
+                    raise ValueError("record runs past the end of the datagram")
+                sequence, pos_x, pos_y, vel_x, vel_y, age, name_length = RECORD.unpack_from(buffer, offset)
+                offset += RECORD.size
+                if offset + name_length > size:
+                    raise ValueError("record runs past the end of the datagram")
+                self.usernames[index] = read_name(view, offset, name_length)
+                offset += name_length
+
+                self.sequences[index] = sequence
+                self.pos_x[index] = pos_x
+                self.pos_y[index] = pos_y
+                self.vel_x[index] = vel_x
+                self.vel_y[index] = vel_y
+                self.ages[index] = age / 1000
+        except struct.error as e:
+            raise ValueError(e)
+        finally:
+            view.release()
+        self.count = count
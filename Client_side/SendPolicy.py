@@ -0,0 +1,34 @@
+class SendPolicy:
+    def __init__(self, threshold=8, keepalive=1.0):
+        """
+        Dead-reckoning send policy: the receivers extrapolate the last sent position with
+        the last sent velocity, so an update is only needed once that guess is off by more
+        than threshold pixels, or when keepalive seconds passed without sending anything.
+        """
+        self.threshold = threshold
+        self.keepalive = keepalive
+        self.last_sent = None  # (time, pos_x, pos_y, vel_x, vel_y)
+
+    def predict(self, now):
+        """Return where the receivers think the player is at the given time."""
+        sent_at, pos_x, pos_y, vel_x, vel_y = self.last_sent
+        elapsed = min(now - sent_at, self.keepalive)
+        return pos_x + vel_x * elapsed, pos_y + vel_y * elapsed
+
+    def should_send(self, now, pos_x, pos_y):
+        """Check whether the position has to be sent now."""
+        if self.last_sent is None or now - self.last_sent[0] >= self.keepalive:
+            return True
+        predicted_x, predicted_y = self.predict(now)
+        return max(abs(pos_x - predicted_x), abs(pos_y - predicted_y)) > self.threshold
+
+    def sent(self, now, pos_x, pos_y):
+        """Record a send and return the velocity it should carry."""
+        vel_x = vel_y = 0
+        if self.last_sent is not None and now > self.last_sent[0]:
+            # Average velocity since the previous send, a wrong guess only costs one extra send
+            sent_at, last_x, last_y = self.last_sent[:3]
+            vel_x = (pos_x - last_x) / (now - sent_at)
+            vel_y = (pos_y - last_y) / (now - sent_at)
+        self.last_sent = (now, pos_x, pos_y, vel_x, vel_y)
+        return vel_x, vel_y
@@ -127,6 +127,12 @@ class Register:
         )
         username_label.place(x=320, y=5, width=85, height=13)
 
+        # Availability hint, checked with the server shortly after the user stops typing
+        self.username_status = Label(parent, text="", fg="#1D4063", font=("Ariel", 10, "bold"), bg="#FFFFFF")
+        self.username_status.place(x=125, y=362)
+        self.username_check = None
+        self.username_entry.bind("<KeyRelease>", self.schedule_username_check)
+
     def create_password_section(self, parent):
         """Create the password input section."""
         self.password_image = PhotoImage(file="../assets/short_input.png")
@@ -194,6 +200,25 @@ class Register:
             )
             error_label.place(x=230, y=460)
 
+    def schedule_username_check(self, event):
+        """Debounce the availability check so it doesn't run on every key press."""
+        if self.username_check is not None:
+            self.window.after_cancel(self.username_check)
+        self.username_check = self.window.after(300, self.check_username)
+
+    def check_username(self):
+        """Show whether the typed username is still free."""
+        self.username_check = None
+        username = self.username_entry.get()
+        available = self.client.username_available(username) if username else None
+        if available is None:
+            # Empty, or the server couldn't be asked, so nothing is known about the username
+            self.username_status.config(text="")
+        elif available:
+            self.username_status.config(text="שם המשתמש פנוי", fg="#1D8A3A")
+        else:
+            self.username_status.config(text="שם המשתמש תפוס", fg="#FF0000")
+
     def LogIn_page(self):
         """Redirect to the login page."""
         self.status[0] = "Log_In"
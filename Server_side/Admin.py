@@ -0,0 +1,168 @@
+import argparse
+import base64
+import csv
+import json
+import os
+import socket
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives import serialization
+from Client_side import Framing
+
+
+class AdminClient:
+    def __init__(self, server_host='192.168.1.212', tcp_port=65432):
+        """
+        Connect to a running server and perform the key exchange so admin actions can be sent.
+        """
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        public_key_pem = private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+
+        self.client_socket = socket.create_connection((server_host, tcp_port))
+        self.client_socket.send(public_key_pem)
+        self.public_server_key = load_pem_public_key(self.client_socket.recv(1024))
+
+    def encrypt(self, payload):
+        """
+        Encrypt a JSON payload for the server. RSA only wraps a fresh AES key, the payload itself is
+        sealed with AES-GCM, so a batch of thousands of rows costs one RSA operation on the server.
+        """
+        key = AESGCM.generate_key(bit_length=256)
+        nonce = os.urandom(12)
+        encrypted_key = self.public_server_key.encrypt(
+            key,
+            padding.OAEP(
+                mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                algorithm=hashes.SHA256(),
+                label=None
+            )
+        )
+        sealed = AESGCM(key).encrypt(nonce, json.dumps(payload).encode('utf-8'), None)
+        return {"key": base64.b64encode(encrypted_key).decode('ascii'),
+                "nonce": base64.b64encode(nonce).decode('ascii'),
+                "sealed": base64.b64encode(sealed).decode('ascii')}
+
+    def request(self, action, payload):
+        """
+        Send an action with a JSON payload and return the JSON response.
+        """
+        self.client_socket.send(action.encode('utf-8'))
+        self.client_socket.recv(1024)  # "Action received" acknowledgement
+        Framing.send_json(self.client_socket, payload)
+        return Framing.recv_json(self.client_socket)
+
+    def bulk_register(self, users, batch_size=5000):
+        """
+        Register (first_name, username, password) rows in chunks and merge the per-row failures.
+        Every chunk is encrypted for the server, since it carries the passwords.
+        """
+        created = 0
+        failures = []
+        for start in range(0, len(users), batch_size):
+            chunk = users[start:start + batch_size]
+            response = self.request('bulk_register', self.encrypt({"users": [list(user) for user in chunk]}))
+            if "error" in response:
+                raise RuntimeError(response["error"])
+            created += response["created"]
+            for failure in response["failures"]:
+                if failure["row"] is not None:
+                    failure["row"] += start
+                failures.append(failure)
+        return created, failures
+
+    def stats(self):
+        """
+        Return the server's user, story and online player counts.
+        """
+        response = self.request('stats', {})
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response
+
+    def list_users(self, after=None, limit=50):
+        """
+        Return one page of users and the cursor for the next page (None on the last page).
+        """
+        response = self.request('list_users', {"after": after, "limit": limit})
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["users"], response["next_after"]
+
+    def close(self):
+        try:
+            self.client_socket.send(b'disconnect')
+            self.client_socket.recv(1024)  # "Action received" acknowledgement
+        finally:
+            self.client_socket.close()
+
+
+def read_users_csv(path):
+    """
+    Read first_name,username,password rows from a CSV file, skipping an optional header.
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        rows = [row for row in csv.reader(file) if row]
+    if rows and [field.strip().lower() for field in rows[0]] == ["first_name", "username", "password"]:
+        rows = rows[1:]
+    return rows
+
+
+def bulk_register_command(admin, args):
+    rows = read_users_csv(args.csv_file)
+    # Malformed rows are sent as they are so the server reports them with their row number
+    created, failures = admin.bulk_register(rows)
+    print(f"Created {created} of {len(rows)} users.")
+    for failure in failures:
+        print(f"Row {failure['row']} ({failure['username']}): {failure['error']}")
+
+
+def stats_command(admin, args):
+    stats = admin.stats()
+    print(f"Users: {stats['users']}")
+    print(f"Stories: {stats['stories']}")
+    print(f"Online players: {stats['online_players']}")
+
+
+def users_command(admin, args):
+    users, next_after = admin.list_users(args.after, args.limit)
+    for user in users:
+        print(f"{user['username']}\t{user['first_name']}")
+    if next_after:
+        print(f"Next page: --after {next_after}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharelit server admin tools")
+    parser.add_argument("--host", default='192.168.1.212', help="server address")
+    parser.add_argument("--port", type=int, default=65432, help="server TCP port")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bulk_register = commands.add_parser("bulk-register", help="register users from a first_name,username,password CSV")
+    bulk_register.add_argument("csv_file")
+    bulk_register.set_defaults(handler=bulk_register_command)
+
+    stats = commands.add_parser("stats", help="show user, story and online player counts")
+    stats.set_defaults(handler=stats_command)
+
+    users = commands.add_parser("users", help="list registered users one page at a time")
+    users.add_argument("--after", help="username the previous page ended with")
+    users.add_argument("--limit", type=int, default=50)
+    users.set_defaults(handler=users_command)
+
+    args = parser.parse_args()
+    admin = AdminClient(args.host, args.port)
+    try:
+        args.handler(admin, args)
+    finally:
+        admin.close()
+
+
+# Main entry point for the admin tools
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import hashlib
+import math
+import threading
+
+
+class BloomFilter:
+    def __init__(self, capacity=100000, error_rate=0.01):
+        """
+        Probabilistic set of strings: a miss is certain, a hit only means "maybe".
+        The bit array is sized for capacity items at the given false positive rate.
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def positions(self, item):
+        """
+        Yield the bit positions for an item using double hashing over one digest.
+        """
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def add(self, item):
+        """
+        Add an item to the filter.
+        """
+        with self.lock:
+            for position in self.positions(item):
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, item):
+        # Bits are only ever set, so reading without the lock can't produce a false negative
+        # for an item whose add() already returned
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+    def is_saturated(self):
+        """
+        Check whether more items were added than the filter was sized for.
+        """
+        return self.count > self.capacity
@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+import queue
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    def __init__(self, db_name, size=8, cache_size_kb=8192, cached_statements=256, busy_timeout=5.0):
+        """
+        Keep a fixed number of SQLite connections that client threads borrow and give back.
+        Every connection runs in WAL mode so readers never wait for a writer.
+        """
+        self.db_name = db_name
+        self.size = size
+        self.cache_size_kb = cache_size_kb
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+
+        # SQLite allows a single writer at a time, so writes are serialized here
+        # instead of letting threads spin on SQLITE_BUSY
+        self.write_lock = threading.Lock()
+
+        self.connections = queue.Queue(maxsize=size)
+        for _ in range(size):
+            self.connections.put(self.make_connection())
+
+    def make_connection(self):
+        """
+        Open a connection with the journal and cache pragmas applied.
+        """
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=self.busy_timeout,
+            check_same_thread=False,  # Connections move between threads, but only one thread holds each
+            cached_statements=self.cached_statements,  # Prepared statement cache per connection
+            isolation_level=None  # Transactions are opened explicitly in write()
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')  # Safe with WAL, avoids an fsync per commit
+        conn.execute(f'PRAGMA cache_size=-{self.cache_size_kb}')  # Negative value means KiB
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    @contextmanager
+    def read(self):
+        """
+        Borrow a connection for read-only queries.
+        """
+        conn = self.connections.get()
+        try:
+            yield conn
+        finally:
+            self.connections.put(conn)
+
+    @contextmanager
+    def write(self):
+        """
+        Borrow a connection and run the block inside a single write transaction.
+        The transaction is committed on success and rolled back on any error.
+        """
+        with self.write_lock:
+            conn = self.connections.get()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
+                conn.execute('COMMIT')
+            finally:
+                self.connections.put(conn)
+
+    def close(self):
+        """
+        Close every pooled connection.
+        """
+        while not self.connections.empty():
+            self.connections.get_nowait().close()
@@ -1,3 +1,5 @@
+import base64
+import json
 import socket
 import threading
 from cryptography.hazmat.primitives.serialization import load_pem_public_key
@@ -5,14 +7,18 @@ from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from Server_side import SqlDataBase, jsonDataBase
 from Client_side.App.User import User
-import json
+from Client_side import Framing
+from Client_side import Packets
+import struct
 import time
 
 
 class Server:
-    def __init__(self, host='192.168.1.212', port=65432, udp_port=12345):
+    def __init__(self, host='192.168.1.212', port=65432, udp_port=12345, admin_hosts=('127.0.0.1',),
+                 player_speed=20, tick_rate=20, player_timeout=5.0, story_batch_size=32):
         """
         Initialize the Server, generate keys, and start the server socket.
         """
@@ -24,7 +30,17 @@ class Server:
         self.host = host
         self.port = port
         self.udp_port = udp_port
+        # Admin actions are only accepted from these addresses. A connection from the server's own
+        # machine to the address it listens on comes from that address, so it is always included
+        self.admin_hosts = set(admin_hosts) | {host}
         self.players = []
+        self.player_speed = player_speed  # Largest move per axis for a single input, matches Player.speed
+        self.tick_interval = 1 / tick_rate  # How often the player snapshot is pushed to every client
+        self.player_timeout = player_timeout  # Players that stay silent longer than this are dropped
+        self.player_addresses = {}  # username -> (UDP address, time of the last update)
+        self.encoded_names = {}  # username -> utf-8 bytes, encoded once for the snapshots
+        self.players_lock = threading.Lock()
+        self.story_batch_size = story_batch_size  # Stories sent per frame when streaming them to a client
 
         # Generate RSA keys (private and public) for encryption/decryption
         self.private_key, self.public_key = self.make_keys()
@@ -33,8 +49,8 @@ class Server:
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         )
 
-        # Print all users from the database (for debugging)
-        self.sql_data_base.print_all_users()
+        # Print how many users are registered (for debugging)
+        print(f"Users in the database: {self.sql_data_base.count_users()}")
 
         # Set up the server socket and start listening for incoming connections
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -52,6 +68,11 @@ class Server:
         udp_thread.daemon = True  # Ensures the thread exits when the main program stops
         udp_thread.start()
 
+        # Push player snapshots on a fixed tick, clients only send when they actually move
+        broadcast_thread = threading.Thread(target=self.broadcast_players)
+        broadcast_thread.daemon = True
+        broadcast_thread.start()
+
         # Start accepting incoming connections in a loop
         print("Server is running...")
         self.listen_for_clients()
@@ -93,97 +114,157 @@ class Server:
         """
 
         time.sleep(0.1)  # Adding a small delay of 100ms
+
+        # One receive buffer for the lifetime of the thread, datagrams are parsed in place
+        buffer = bytearray(2048)
+        view = memoryview(buffer)
         while True:
             if self.udp_socket.fileno() == -1:
                 print("Socket is closed.")
                 break
             # Receive data from the socket
-            massage, client_address = self.udp_socket.recvfrom(1024)
-            data = json.loads(massage.decode('utf-8'))
-            action = data['action']
-
-
-            print(f"Received UDP message from {client_address}: {action}\n")
-
-            if action == "send_player_data":
-                self.update_and_send_players(data, client_address)
-            elif action == "logout":
-                self.handle_logout_udp(data, client_address)
-
-
-
-
-    def update_and_send_players(self, data, client_address):
+            try:
+                size, client_address = self.udp_socket.recvfrom_into(buffer)
+            except OSError as e:
+                # Windows reports ICMP port unreachable for clients that went away as a reset
+                print(f"Error receiving UDP message: {e}")
+                continue
+            if size == 0:
+                continue
+
+            try:
+                packet_type = buffer[0]
+                if packet_type == Packets.PLAYER_UPDATE:
+                    _, sequence, pos_x, pos_y, vel_x, vel_y, name_length = Packets.UPDATE.unpack_from(buffer, 0)
+                    if Packets.UPDATE.size + name_length > size:
+                        raise ValueError("username runs past the end of the datagram")
+                    username = Packets.read_name(view, Packets.UPDATE.size, name_length)
+                    self.update_player(username, pos_x, pos_y, sequence, vel_x, vel_y, client_address)
+                elif packet_type == Packets.LOGOUT:
+                    _, name_length = Packets.LOGOUT_HEADER.unpack_from(buffer, 0)
+                    if Packets.LOGOUT_HEADER.size + name_length > size:
+                        raise ValueError("username runs past the end of the datagram")
+                    username = Packets.read_name(view, Packets.LOGOUT_HEADER.size, name_length)
+                    self.handle_logout_udp(username, client_address)
+            except (struct.error, ValueError) as e:
+                print(f"Ignoring malformed UDP message from {client_address}: {e}")
+
+    def update_player(self, username, pos_x, pos_y, sequence, vel_x, vel_y, client_address):
         """
-        Receive player data from a client (username, pos_x, pos_y) and send all players' information via UDP.
+        Receive player data from a client (username, position, input sequence, velocity).
+        Every client gets the result with the next snapshot from broadcast_players.
         """
-        if not data:  # Check if the data is empty
-            print("Received empty data, ignoring...")
-            return  # Ignore if data is empty
-
-
-        # Extract player info safely with validation
-        username = data.get("username")
-        pos_x = data.get("pos_x")
-        pos_y = data.get("pos_y")
+        with self.players_lock:
+            # Update or add the player to the list
+            player_updated = False
+            for player in self.players:
+                if player.username == username:
+                    if not self.move_player(player, pos_x, pos_y, sequence):
+                        # A stale update doesn't keep the session alive, so a restarted client
+                        # times out and comes back as a new player
+                        return
+                    player_updated = True
+                    break
 
-        print(f"Received via UDP -> username: {username}, x: {pos_x}, y: {pos_y}\n")
+            if not player_updated:
+                player = User(username, pos_x, pos_y, sequence)
+                self.players.append(player)
+                self.encoded_names[username] = username.encode('utf-8')[:Packets.MAX_NAME]
+                print(f"Added new player: {username}")
 
-        # Update or add the player to the list
-        player_updated = False
-        for player in self.players:
-            if player.username == username:
-                player.pos_x = pos_x
-                player.pos_y = pos_y
-                player_updated = True
-                print(f"Updated existing player: {username} with new position.")
-                break
+            # Velocity lets the other clients dead-reckon this player between sparse updates
+            player.vel_x = vel_x
+            player.vel_y = vel_y
+            self.player_addresses[username] = (client_address, time.monotonic())
 
-        if not player_updated:
-            self.players.append(User(username, pos_x, pos_y))
-            print(f"Added new player: {username}")
-
-        # Prepare and send all players' information to the client
-        players_data = {
-            "num_players": len(self.players),
-            "players": [{"username": player.username, "pos_x": player.pos_x, "pos_y": player.pos_y} for player in
-                        self.players]
-        }
-        # Convert the players data to a JSON string and send it via UDP
-        data_to_send = json.dumps(players_data)
-        self.udp_socket.sendto(data_to_send.encode('utf-8'), client_address)
-        print("All players' data sent successfully via UDP.\n")
+    def broadcast_players(self):
+        """
+        Send all players' information to every connected player on a fixed tick.
+        """
+        # The snapshot is packed into the same buffer every tick
+        buffer = bytearray(Packets.MAX_DATAGRAM)
+        view = memoryview(buffer)
+        while True:
+            time.sleep(self.tick_interval)
+            now = time.monotonic()
+
+            with self.players_lock:
+                # Forget players that stopped sending keep-alives without logging out
+                for player in list(self.players):
+                    address = self.player_addresses.get(player.username)
+                    if address is None or now - address[1] > self.player_timeout:
+                        self.players.remove(player)
+                        self.player_addresses.pop(player.username, None)
+                        self.encoded_names.pop(player.username, None)
+                        print(f"Player {player.username} timed out.")
+
+                if not self.players:
+                    continue
+
+                # Pack all players' information once, age tells clients how old each position is
+                size = Packets.pack_snapshot(buffer, (
+                    (self.encoded_names[player.username], player.last_sequence, player.pos_x, player.pos_y,
+                     player.vel_x, player.vel_y, now - self.player_addresses[player.username][1])
+                    for player in self.players
+                ))
+                addresses = [address for address, _ in self.player_addresses.values()]
+
+            # Send the same datagram to everyone via UDP
+            for address in addresses:
+                try:
+                    self.udp_socket.sendto(view[:size], address)
+                except OSError as e:
+                    print(f"Error sending players to {address}: {e}")
+
+    def move_player(self, player, pos_x, pos_y, sequence):
+        """
+        Apply a reported position, limited to how far the player's new inputs could have moved it.
+        The accepted sequence is sent back so the client can replay the inputs after it.
+        Returns False for a stale update, one older than the inputs already applied.
+        """
+        if sequence == player.last_sequence:
+            return True  # No new input since the last update, still a keep-alive
+        if sequence < player.last_sequence:
+            # Late or replayed, the sequence only starts over with a new session after a logout or a timeout
+            return False
+
+        budget = self.player_speed * (sequence - player.last_sequence)
+        player.pos_x = max(player.pos_x - budget, min(pos_x, player.pos_x + budget))
+        player.pos_y = max(player.pos_y - budget, min(pos_y, player.pos_y + budget))
+        player.last_sequence = sequence
+        return True
 
     def handle_receive_stories(self, client_socket):
         """
         Handle the request for stories from the client using TCP.
+        The client sends how many stories it already has, and the version of the store they came from,
+        and only receives the ones after that.
         """
-        print("Sending stories to client via TCP...\n")
+        since, _, version = client_socket.recv(1024).decode('utf-8').partition(',')
+        since = int(since or 0)
+        total = len(self.json_data_base.get_data())
+        if since < 0 or since > total or (since and version != self.json_data_base.version):
+            since = 0  # The client's cursor is from another story store, send everything
+        print(f"Sending stories from {since} to client via TCP...\n")
 
         # Retrieve data from database
-        titles, contents, usernames, pos_x, pos_y = self.json_data_base.receive_data()
-
-        # Create dictionary with the data
-        data = {
-            "titles": titles or [],
-            "contents": contents or [],
-            "usernames": usernames or [],
-            "pos_x": pos_x or [],
-            "pos_y": pos_y or []
-        }
-
-        # Convert to JSON string
-        json_data = json.dumps(data)
+        titles, contents, usernames, pos_x, pos_y = self.json_data_base.receive_data(since)
+        stories = list(zip(titles, contents, usernames, pos_x, pos_y))
 
         try:
-            # Send data through TCP socket
-            client_socket.send(json_data.encode('utf-8'))
+            # A header frame, the stories in small frames the client can use as they arrive, then an empty frame
+            Framing.send_json(client_socket, {
+                "version": self.json_data_base.version,
+                "since": since,
+                "total": since + len(stories)
+            })
+            for start in range(0, len(stories), self.story_batch_size):
+                Framing.send_json(client_socket, stories[start:start + self.story_batch_size])
+            Framing.send_frame(client_socket, b'')
             print("Stories sent successfully.\n")
         except Exception as e:
             print(f"Error sending stories: {e}")
 
-
-
     def handle_client(self, client_socket, client_address):
         """
         Handle communication with a connected client.
@@ -211,10 +292,35 @@ class Server:
                 elif action == 'add_story':
                     self.handle_add_story(client_socket)
 
+                elif action == 'add_stories':
+                    self.handle_add_stories(client_socket)
+
+                elif action == 'search_stories':
+                    self.handle_search_stories(client_socket)
+
+                elif action == 'nearest_stories':
+                    self.handle_nearest_stories(client_socket)
+
+                elif action == 'username_available':
+                    self.handle_username_available(client_socket)
+
+                elif action == 'bulk_register':
+                    self.handle_bulk_register(client_socket, client_address)
+
+                elif action == 'stats':
+                    self.handle_stats(client_socket, client_address)
+
+                elif action == 'list_users':
+                    self.handle_list_users(client_socket, client_address)
+
                 elif action == 'logout':
                     self.handle_logout(client_socket)
                     break
 
+                elif action == 'disconnect':
+                    # Leaving without a player session, like the admin tools do
+                    break
+
         except Exception as e:
             print(f"Error with client {client_address}: {e}\n")
 
@@ -247,10 +353,86 @@ class Server:
 
         if self.sql_data_base.create_user(first_name, username, password):
             client_socket.send(b'Registration successful')
-            self.sql_data_base.print_all_users()
         else:
             client_socket.send(b'Registration failed')
 
+    def handle_username_available(self, client_socket):
+        """
+        Handle a check whether a username is still free, used while the user types on the Register screen.
+        """
+        username = client_socket.recv(1024).decode('utf-8')
+        if self.sql_data_base.username_available(username):
+            client_socket.send(b'True')
+        else:
+            client_socket.send(b'False')
+
+    def decrypt_payload(self, request):
+        """
+        Decrypt an admin payload sealed with an AES key that is itself encrypted with our public key.
+        """
+        key = self.decrypt(base64.b64decode(request["key"]))
+        sealed = AESGCM(key).decrypt(base64.b64decode(request["nonce"]), base64.b64decode(request["sealed"]), None)
+        return json.loads(sealed.decode('utf-8'))
+
+    def is_admin(self, client_address):
+        """
+        Check whether a connection may run admin actions.
+        """
+        return client_address[0] in self.admin_hosts
+
+    def handle_bulk_register(self, client_socket, client_address):
+        """
+        Handle an admin request to register many users at once.
+        """
+        request = Framing.recv_json(client_socket)
+        if not self.is_admin(client_address):
+            print(f"Rejected bulk registration from {client_address}\n")
+            Framing.send_json(client_socket, {"error": "admin actions are not allowed from this address"})
+            return
+
+        try:
+            # The rows carry passwords, so the whole payload arrives encrypted
+            request = self.decrypt_payload(request)
+        except Exception as e:
+            print(f"Could not decrypt bulk registration from {client_address}: {e}\n")
+            Framing.send_json(client_socket, {"error": "could not decrypt the request"})
+            return
+
+        users = [(user.get("first_name"), user.get("username"), user.get("password")) if isinstance(user, dict) else user
+                 for user in request.get("users", [])]
+        print(f"Bulk registering {len(users)} users\n")
+
+        created, failures = self.sql_data_base.create_users(users)
+        Framing.send_json(client_socket, {"created": created, "failures": failures})
+
+    def handle_stats(self, client_socket, client_address):
+        """
+        Handle an admin request for server statistics.
+        """
+        Framing.recv_json(client_socket)
+        if not self.is_admin(client_address):
+            Framing.send_json(client_socket, {"error": "admin actions are not allowed from this address"})
+            return
+
+        Framing.send_json(client_socket, {
+            "users": self.sql_data_base.count_users(),
+            "stories": len(self.json_data_base.get_data()),
+            "online_players": len(self.players)
+        })
+
+    def handle_list_users(self, client_socket, client_address, max_limit=500):
+        """
+        Handle an admin request for one page of registered users.
+        """
+        request = Framing.recv_json(client_socket)
+        if not self.is_admin(client_address):
+            Framing.send_json(client_socket, {"error": "admin actions are not allowed from this address"})
+            return
+
+        limit = max(1, min(int(request.get("limit", 50)), max_limit))
+        users, next_after = self.sql_data_base.list_users(request.get("after"), limit)
+        Framing.send_json(client_socket, {"users": users, "next_after": next_after})
+
     def handle_add_story(self, client_socket):
         """
         Handle adding a new story from the client, now including pos_x and pos_y.
@@ -278,6 +460,58 @@ class Server:
         self.json_data_base.add_entry(title, content, username, pos_x, pos_y)
         print("Story added to database.\n")
 
+    def handle_add_stories(self, client_socket, max_batch=100):
+        """
+        Handle a batch of stories uploaded from a client's outbox.
+        Every story carries a key, stories already stored under their key are acknowledged but not stored again,
+        so the client can retry a batch whose reply it never got.
+        """
+        request = Framing.recv_json(client_socket)
+        entries = []
+        acked = []
+        for story in request.get("stories", [])[:max_batch]:
+            try:
+                key = str(story["key"])
+                entries.append((str(story["title"]), str(story["content"]), str(story["username"]),
+                                int(story["pos_x"]), int(story["pos_y"]), key))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Dropping malformed story: {e}\n")
+                if isinstance(story, dict) and "key" in story:
+                    acked.append(str(story["key"]))  # Retrying can't fix it, let the client drop it
+                continue
+            acked.append(key)
+
+        added = self.json_data_base.add_entries(entries)
+        print(f"Added {added} of {len(entries)} uploaded stories to database.\n")
+        Framing.send_json(client_socket, {"acked": acked, "added": added})
+
+    def handle_search_stories(self, client_socket, max_limit=50):
+        """
+        Handle a full-text search over story titles and contents.
+        """
+        request = Framing.recv_json(client_socket)
+        query = str(request.get("query", ""))
+        limit = max(0, min(int(request.get("limit", 10)), max_limit))
+        print(f"Searching stories for: {query}\n")
+
+        results = self.json_data_base.search(query, limit)
+        Framing.send_json(client_socket, {"results": results})
+        print(f"Sent {len(results)} search results.\n")
+
+    def handle_nearest_stories(self, client_socket, max_k=50):
+        """
+        Handle a request for the stories closest to a map position.
+        """
+        request = Framing.recv_json(client_socket)
+        pos_x = float(request.get("pos_x", 0))
+        pos_y = float(request.get("pos_y", 0))
+        k = max(0, min(int(request.get("k", 5)), max_k))
+        print(f"Looking up {k} stories near ({pos_x}, {pos_y})\n")
+
+        results = self.json_data_base.nearest(pos_x, pos_y, k)
+        Framing.send_json(client_socket, {"results": results})
+        print(f"Sent {len(results)} nearby stories.\n")
+
     def handle_logout(self, client_socket):
         """
         Handle client logout and remove the player from the players list.
@@ -296,29 +530,30 @@ class Server:
             print(f"Error during logout: {e}")
             client_socket.send(b"Error during logout.")
 
-    def handle_logout_udp(self, data, client_address):
+    def handle_logout_udp(self, username, client_address):
         """
         Handle client logout and remove the player from the players list.
         """
         try:
-            # Receive the username of the player who is logging out
-            username = data['username']
             print(f"Logout request received for {username}\n")
 
             # Find the player in the list and remove them
             player_found = False
-            for player in self.players:
-                if player.username == username:
-                    self.players.remove(player)
-                    player_found = True
-                    print(f"Player {username} removed from the players list.")
-                    break
+            with self.players_lock:
+                self.player_addresses.pop(username, None)
+                self.encoded_names.pop(username, None)
+                for player in self.players:
+                    if player.username == username:
+                        self.players.remove(player)
+                        player_found = True
+                        print(f"Player {username} removed from the players list.")
+                        break
 
             if player_found:
-                self.udp_socket.sendto(b'Logout successful, you have been removed from the players list.', client_address)
+                self.udp_socket.sendto(bytes([Packets.LOGOUT_REPLY]) + b'Logout successful, you have been removed from the players list.', client_address)
 
             else:
-                self.udp_socket.sendto(b'Player not found, could not log out.', client_address)
+                self.udp_socket.sendto(bytes([Packets.LOGOUT_REPLY]) + b'Player not found, could not log out.', client_address)
 
         except Exception as e:
             print(f"Error during logout: {e}")
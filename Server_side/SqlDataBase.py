@@ -1,34 +1,85 @@
 import sqlite3
 import hashlib
+import threading
+from Server_side.ConnectionPool import ConnectionPool
+from Server_side.BloomFilter import BloomFilter
 
 class SqlDataBase:
-    def __init__(self, host='127.0.0.1', port=65432):
+    def __init__(self, host='127.0.0.1', port=65432, pool_size=8):
         db_name = 'users.db'
-        # Initialize the server and database connection
+        # Initialize the server and the pooled database connections
         self.db_name = db_name
-        self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        self.cursor = self.conn.cursor()
+        self.pool = ConnectionPool(self.db_name, size=pool_size)
 
         # Create or update the users table to include a balance column
-        self.cursor.execute('''
-                      CREATE TABLE IF NOT EXISTS users (
-                          username TEXT PRIMARY KEY,
-                          password TEXT,
-                          first_name TEXT
-                      )
-                  ''')
-        self.conn.commit()
+        with self.pool.write() as conn:
+            conn.execute('''
+                          CREATE TABLE IF NOT EXISTS users (
+                              username TEXT PRIMARY KEY,
+                              password TEXT,
+                              first_name TEXT
+                          )
+                      ''')
 
+            # Row counts are maintained by triggers so they never need a full table scan
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            if conn.execute("SELECT 1 FROM counters WHERE name='users'").fetchone() is None:
+                # One-time count for databases created before the counters table existed
+                conn.execute("INSERT INTO counters (name, value) SELECT 'users', COUNT(*) FROM users")
+            conn.execute('''
+                          CREATE TRIGGER IF NOT EXISTS users_count_insert AFTER INSERT ON users
+                          BEGIN UPDATE counters SET value = value + 1 WHERE name = 'users'; END
+                      ''')
+            conn.execute('''
+                          CREATE TRIGGER IF NOT EXISTS users_count_delete AFTER DELETE ON users
+                          BEGIN UPDATE counters SET value = value - 1 WHERE name = 'users'; END
+                      ''')
 
+        # Load every username into the in-memory filter used by username_available
+        self.usernames_lock = threading.RLock()
+        self.load_usernames()
+
+    def load_usernames(self, min_capacity=100000):
+        """Rebuild the username Bloom filter from the committed rows of the users table"""
+        with self.usernames_lock:
+            with self.pool.read() as conn:
+                usernames = [row[0] for row in conn.execute('SELECT username FROM users')]
+            usernames_filter = BloomFilter(capacity=max(min_capacity, len(usernames) * 2))
+            for username in usernames:
+                usernames_filter.add(username)
+            self.usernames = usernames_filter
+        print(f"Loaded {len(usernames)} usernames into the availability filter.")
+
+    def remember_username(self, username):
+        """Add a committed username to the filter, growing it once it is over capacity"""
+        with self.usernames_lock:
+            self.usernames.add(username)
+            if self.usernames.is_saturated():
+                self.load_usernames(min_capacity=self.usernames.capacity * 2)
+
+    def username_available(self, username):
+        """Check if a username can still be registered"""
+        if not isinstance(username, str) or not username.strip() or ',' in username:
+            return False
+        # A Bloom filter miss is definite, only possible hits need the primary key lookup
+        if username not in self.usernames:
+            return True
+        with self.pool.read() as conn:
+            return conn.execute('SELECT 1 FROM users WHERE username=?', (username,)).fetchone() is None
+
+    @staticmethod
+    def hash_password(password):
+        """Hash a password the way it is stored in the users table"""
+        return hashlib.sha256((password + "daddy").encode('utf-8')).hexdigest()
 
     def check_credentials(self, username, password):
         """Check user credentials for login"""
         try:
             # ashing password
-            password =hashlib.sha256((password + "daddy").encode('utf-8')).hexdigest()
+            password = self.hash_password(password)
 
-            self.cursor.execute('SELECT * FROM users WHERE username=?', (username,))
-            result = self.cursor.fetchone()
+            with self.pool.read() as conn:
+                result = conn.execute('SELECT * FROM users WHERE username=?', (username,)).fetchone()
             if result:
                 stored_password = result[1]  # Password stored as plain text
                 if stored_password == password:
@@ -42,14 +93,20 @@ class SqlDataBase:
         """Create a new user and insert into the database"""
 
         try:
+            # Reject taken usernames before paying for the hash and the insert
+            if not self.username_available(username):
+                print(f"Error: A user with the email '{username}' already exists.")
+                return False
+
             #ashing password
-            password = hashlib.sha256((password + "daddy").encode('utf-8')).hexdigest()
+            password = self.hash_password(password)
 
-            self.cursor.execute(
-                'INSERT INTO users (first_name, username, password) VALUES (?, ?, ?)',
-                (first_name, username, password)
-            )
-            self.conn.commit()
+            with self.pool.write() as conn:
+                conn.execute(
+                    'INSERT INTO users (first_name, username, password) VALUES (?, ?, ?)',
+                    (first_name, username, password)
+                )
+            self.remember_username(username)
             print("User created successfully.")
             return True
         except sqlite3.IntegrityError:
@@ -59,11 +116,106 @@ class SqlDataBase:
             print(f"Unexpected error while creating user: {e}")
             return False
 
+    def validate_user(self, first_name, username, password):
+        """Return an error message if the user fields can't be registered, otherwise None"""
+        fields = {"first_name": first_name, "username": username, "password": password}
+        for name, value in fields.items():
+            if not isinstance(value, str) or not value.strip():
+                return f"{name} is missing"
+            # The login and register messages are comma separated
+            if ',' in value:
+                return f"{name} can't contain a comma"
+        return None
+
+    def create_users(self, users, batch_size=500):
+        """
+        Create many users in a single transaction.
+        Takes (first_name, username, password) rows and returns the number of created users
+        and a list of per-row failures, so one bad row doesn't abort the whole batch.
+        """
+        failures = []
+        valid_rows = []
+        seen = set()
+        for row_number, user in enumerate(users):
+            try:
+                first_name, username, password = user
+            except (TypeError, ValueError):
+                failures.append({"row": row_number, "username": None, "error": "expected first_name, username, password"})
+                continue
+            error = self.validate_user(first_name, username, password)
+            if error is None and username in seen:
+                error = "duplicate username in batch"
+            if error:
+                failures.append({"row": row_number, "username": username, "error": error})
+                continue
+            seen.add(username)
+            valid_rows.append((row_number, first_name, username, password))
+
+        # Hash all passwords up front, outside the write transaction.
+        # 50k salted sha256 hashes take under 0.1 s in total, less than a worker pool spends handing them out
+        hashed = [self.hash_password(row[3]) for row in valid_rows]
+
+        created = []
+        try:
+            with self.pool.write() as conn:
+                for start in range(0, len(valid_rows), batch_size):
+                    batch = valid_rows[start:start + batch_size]
+                    batch_hashes = hashed[start:start + batch_size]
+
+                    # Filter out usernames that are already taken, only possible filter hits are looked up
+                    maybe_taken = [row[2] for row in batch if row[2] in self.usernames]
+                    existing = set()
+                    if maybe_taken:
+                        placeholders = ','.join('?' * len(maybe_taken))
+                        existing = {row[0] for row in conn.execute(
+                            f'SELECT username FROM users WHERE username IN ({placeholders})', maybe_taken
+                        )}
+
+                    inserts = []
+                    for (row_number, first_name, username, _), password in zip(batch, batch_hashes):
+                        if username in existing:
+                            failures.append({"row": row_number, "username": username, "error": "username already exists"})
+                        else:
+                            inserts.append((first_name, username, password))
+
+                    conn.executemany('INSERT INTO users (first_name, username, password) VALUES (?, ?, ?)', inserts)
+                    created.extend(username for _, username, _ in inserts)
+        except Exception as e:
+            print(f"Unexpected error while creating users: {e}")
+            return 0, failures + [{"row": None, "username": None, "error": f"batch rolled back: {e}"}]
+
+        # The filter is only updated once the rows are committed
+        for username in created:
+            self.remember_username(username)
+
+        failures.sort(key=lambda failure: failure["row"])
+        print(f"Bulk registration created {len(created)} users, {len(failures)} rows failed.")
+        return len(created), failures
+
+    def count_users(self):
+        """Return the number of registered users from the maintained counter"""
+        with self.pool.read() as conn:
+            return conn.execute("SELECT value FROM counters WHERE name='users'").fetchone()[0]
+
+    def list_users(self, after=None, limit=50):
+        """
+        Return one page of users ordered by username, without their password hashes.
+        Pages are keyed by the last username of the previous page, so each page is a primary key range scan.
+        """
+        with self.pool.read() as conn:
+            rows = conn.execute(
+                'SELECT username, first_name FROM users WHERE username > ? ORDER BY username LIMIT ?',
+                (after or '', limit)
+            ).fetchall()
+        users = [{"username": username, "first_name": first_name} for username, first_name in rows]
+        next_after = rows[-1][0] if len(rows) == limit else None
+        return users, next_after
+
     def print_all_users(self):
         """Print all users in the database, including their balance"""
         try:
-            self.cursor.execute('SELECT * FROM users')
-            rows = self.cursor.fetchall()
+            with self.pool.read() as conn:
+                rows = conn.execute('SELECT * FROM users').fetchall()
             if rows:
                 print("Users in the database:")
                 for row in rows:
@@ -0,0 +1,100 @@
+import heapq
+import math
+import re
+import threading
+
+# Hebrew final letters are folded into their regular forms (ך -> כ, ם -> מ, ...)
+FINAL_LETTERS = str.maketrans({'ך': 'כ', 'ם': 'מ', 'ן': 'נ', 'ף': 'פ', 'ץ': 'צ'})
+# Niqqud and cantillation marks, plus geresh / gershayim used inside acronyms (צה"ל)
+HEBREW_MARKS = re.compile('[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7\u05F3\u05F4"\']')
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """
+    Split text into normalized search tokens.
+    Latin text is lowercased, Hebrew text loses its niqqud and final letter forms.
+    """
+    text = HEBREW_MARKS.sub('', text.lower()).translate(FINAL_LETTERS)
+    return TOKEN_PATTERN.findall(text)
+
+
+class StoryIndex:
+    def __init__(self, k1=1.2, b=0.75, title_weight=2):
+        """
+        Inverted index over story titles and contents, ranked with BM25.
+        """
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight  # Title tokens count this many times towards term frequency
+
+        self.postings = {}  # token -> {story_id: term frequency}
+        self.doc_lengths = {}  # story_id -> number of weighted tokens
+        self.total_length = 0
+        self.lock = threading.Lock()
+
+    def add(self, story_id, title, content):
+        """
+        Index a single story under the given id.
+        """
+        frequencies = {}
+        for token in tokenize(title):
+            frequencies[token] = frequencies.get(token, 0) + self.title_weight
+        for token in tokenize(content):
+            frequencies[token] = frequencies.get(token, 0) + 1
+        length = sum(frequencies.values())
+
+        with self.lock:
+            for token, frequency in frequencies.items():
+                self.postings.setdefault(token, {})[story_id] = frequency
+            self.doc_lengths[story_id] = length
+            self.total_length += length
+
+    def add_all(self, entries):
+        """
+        Index a list of story entries, using their position in the list as the id.
+        """
+        for story_id, entry in enumerate(entries):
+            self.add(story_id, entry['title'], entry['content'])
+
+    def search(self, query, limit=10):
+        """
+        Return up to limit (story_id, score) pairs, best match first.
+        """
+        tokens = set(tokenize(query))
+        if not tokens or limit <= 0:
+            return []
+
+        with self.lock:
+            num_docs = len(self.doc_lengths)
+            if num_docs == 0:
+                return []
+            avg_length = self.total_length / num_docs
+
+            # Rarest tokens first. A token adds at most idf * (k1 + 1) to a story's score, so once the
+            # limit-th best score beats what all remaining tokens could add, no new story can make the
+            # results and the common tokens only score the stories already found instead of their whole posting
+            postings = []
+            for token in tokens:
+                posting = self.postings.get(token)
+                if posting:
+                    idf = math.log(1 + (num_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                    postings.append((idf, posting))
+            postings.sort(key=lambda item: item[0], reverse=True)
+            remaining = sum(idf for idf, _ in postings) * (self.k1 + 1)
+
+            scores = {}
+            for idf, posting in postings:
+                if len(scores) >= limit and heapq.nlargest(limit, scores.values())[-1] >= remaining:
+                    story_ids = [story_id for story_id in scores if story_id in posting]
+                else:
+                    story_ids = posting
+                for story_id in story_ids:
+                    frequency = posting[story_id]
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[story_id] / avg_length)
+                    score = idf * frequency * (self.k1 + 1) / (frequency + norm)
+                    scores[story_id] = scores.get(story_id, 0.0) + score
+                remaining -= idf * (self.k1 + 1)
+
+        # Keep only the best results instead of sorting every match
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,127 @@
+import heapq
+import threading
+from operator import itemgetter
+
+
+class KDTree:
+    def __init__(self, points):
+        """
+        Build a 2-d tree over (x, y, story_id) points.
+        """
+        self.size = len(points)
+        self.root = self.build(list(points), 0)
+
+    def build(self, points, depth):
+        """
+        Recursively split the points on the median of alternating axes.
+        Each node is a tuple of (point, axis, left subtree, right subtree).
+        """
+        if not points:
+            return None
+        axis = depth % 2
+        points.sort(key=itemgetter(axis))
+        mid = len(points) // 2
+        return (points[mid], axis,
+                self.build(points[:mid], depth + 1),
+                self.build(points[mid + 1:], depth + 1))
+
+    def nearest(self, x, y, k, heap=None):
+        """
+        Return a max-heap of (-squared distance, story_id) holding the k nearest points.
+        An existing heap can be passed in to merge results with other candidates.
+        """
+        heap = [] if heap is None else heap
+        target = (x, y)
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            point, axis, left, right = node
+            push_candidate(heap, k, point, x, y)
+
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # Only look across the splitting line if it is closer than the worst kept point
+            if far is not None and (len(heap) < k or diff * diff < -heap[0][0]):
+                stack.append(far)
+            stack.append(near)
+        return heap
+
+
+def push_candidate(heap, k, point, x, y):
+    """
+    Keep point in the k-sized max-heap if it is among the nearest seen so far.
+    """
+    dx = point[0] - x
+    dy = point[1] - y
+    entry = (-(dx * dx + dy * dy), point[2])
+    if len(heap) < k:
+        heapq.heappush(heap, entry)
+    elif entry > heap[0]:
+        heapq.heapreplace(heap, entry)
+
+
+class StoryLocator:
+    def __init__(self, rebuild_ratio=0.25, min_pending=64):
+        """
+        Answer k-nearest story queries over story positions.
+        Stories added after the last build are scanned linearly until a background rebuild absorbs them.
+        """
+        self.rebuild_ratio = rebuild_ratio
+        self.min_pending = min_pending
+
+        self.points = []  # (x, y, story_id) for every known story
+        self.tree = KDTree([])
+        self.rebuilding = False
+        self.lock = threading.Lock()
+
+    def add(self, story_id, x, y):
+        """
+        Register a story position and schedule a rebuild when enough new stories piled up.
+        """
+        with self.lock:
+            self.points.append((x, y, story_id))
+            pending = len(self.points) - self.tree.size
+            if self.rebuilding or pending < max(self.min_pending, self.tree.size * self.rebuild_ratio):
+                return
+            self.rebuilding = True
+            snapshot = list(self.points)
+
+        rebuild_thread = threading.Thread(target=self.rebuild, args=(snapshot,))
+        rebuild_thread.daemon = True
+        rebuild_thread.start()
+
+    def add_all(self, entries):
+        """
+        Register a list of story entries and build the tree right away.
+        """
+        with self.lock:
+            self.points.extend((entry['pos_x'], entry['pos_y'], story_id) for story_id, entry in enumerate(entries))
+            snapshot = list(self.points)
+        self.rebuild(snapshot)
+
+    def rebuild(self, snapshot):
+        """
+        Build a new tree over the snapshot and swap it in.
+        """
+        tree = KDTree(snapshot)
+        with self.lock:
+            self.tree = tree
+            self.rebuilding = False
+        print(f"Story locator rebuilt over {tree.size} stories.")
+
+    def nearest(self, x, y, k=5):
+        """
+        Return up to k (story_id, distance) pairs, nearest first.
+        """
+        if k <= 0:
+            return []
+        with self.lock:
+            tree = self.tree
+            pending = self.points[tree.size:]
+
+        heap = tree.nearest(x, y, k)
+        for point in pending:
+            push_candidate(heap, k, point, x, y)
+        return [(story_id, (-neg_distance) ** 0.5) for neg_distance, story_id in sorted(heap, reverse=True)]
@@ -1,8 +1,16 @@
 import json
+import threading
+import uuid
+from Server_side.StoryIndex import StoryIndex
+from Server_side.StoryLocator import StoryLocator
+
+# Fields of a story that clients see, the same ones receive_data sends
+PUBLIC_FIELDS = ("title", "content", "username", "pos_x", "pos_y")
 
 class jsonDataBase:
     def __init__(self, filename="data.json"):
         self.filename = filename
+        self.version = self.load_version(filename + ".version")
         try:
             # Try to load existing JSON data from the file
             with open(self.filename, 'r') as file:
@@ -11,19 +19,70 @@ class jsonDataBase:
             # If the file doesn't exist or is empty, initialize with an empty list
             self.data = []
 
-    def add_entry(self, title, content, username, pos_x, pos_y):
+        # Keys of stories uploaded with one, so a retried upload is only stored once
+        self.story_keys = {entry['key'] for entry in self.data if entry.get('key')}
+        self.lock = threading.Lock()
+
+        # Build the full-text index once, then keep it updated in add_entry
+        self.index = StoryIndex()
+        self.index.add_all(self.data)
+
+        # Spatial index over story positions for nearest-story queries
+        self.locator = StoryLocator()
+        self.locator.add_all(self.data)
+
+    def load_version(self, version_filename):
+        """
+        Returns the id of this story store, so clients can tell their cached stories apart from another store's.
+        A new id is written the first time the store is used.
+        """
+        try:
+            with open(version_filename, 'r') as file:
+                version = file.read().strip()
+            if version:
+                return version
+        except FileNotFoundError:
+            pass
+        version = uuid.uuid4().hex
+        with open(version_filename, 'w') as file:
+            file.write(version)
+        return version
+
+    def add_entry(self, title, content, username, pos_x, pos_y, key=None):
         """
         Adds an entry with a title, content, username, pos_x, and pos_y to the JSON data.
+        Returns False without adding anything if an entry with the same key was already added.
+        """
+        added = self.add_entries([(title, content, username, pos_x, pos_y, key)])
+        return added == 1
+
+    def add_entries(self, entries):
         """
-        entry = {
-            "title": title.strip(),
-            "content": content.strip(),
-            "username": username.strip(),
-            "pos_x": pos_x,
-            "pos_y": pos_y
-        }
-        self.data.append(entry)
-        self.save()
+        Adds many (title, content, username, pos_x, pos_y, key) entries and saves the file once.
+        Entries whose key was already added are skipped. Returns how many entries were added.
+        """
+        added = 0
+        with self.lock:
+            for title, content, username, pos_x, pos_y, key in entries:
+                if key and key in self.story_keys:
+                    continue
+                entry = {
+                    "title": title.strip(),
+                    "content": content.strip(),
+                    "username": username.strip(),
+                    "pos_x": pos_x,
+                    "pos_y": pos_y
+                }
+                if key:
+                    entry["key"] = key
+                    self.story_keys.add(key)
+                self.data.append(entry)
+                self.index.add(len(self.data) - 1, entry['title'], entry['content'])
+                self.locator.add(len(self.data) - 1, pos_x, pos_y)
+                added += 1
+            if added:
+                self.save()
+        return added
 
     def get_data(self):
         """
@@ -31,15 +90,37 @@ class jsonDataBase:
         """
         return self.data
 
-    def receive_data(self):
+    def search(self, query, limit=10):
+        """
+        Returns the entries that best match the query, each with its search score.
+        """
+        return [dict(self.public_entry(story_id), score=score) for story_id, score in self.index.search(query, limit)]
+
+    def nearest(self, pos_x, pos_y, k=5):
+        """
+        Returns the k entries closest to the given position, each with its distance.
+        """
+        return [dict(self.public_entry(story_id), distance=distance)
+                for story_id, distance in self.locator.nearest(pos_x, pos_y, k)]
+
+    def public_entry(self, story_id):
+        """
+        Returns the fields of an entry that are sent to clients, leaving out the upload key.
+        """
+        entry = self.data[story_id]
+        return {field: entry[field] for field in PUBLIC_FIELDS}
+
+    def receive_data(self, since=0):
         """
         Returns four lists: one for titles, one for contents, one for usernames, and one for positions.
+        Only entries from index since onwards are included, entries are never reordered or removed.
         """
-        titles = [entry['title'] for entry in self.data]
-        contents = [entry['content'] for entry in self.data]
-        usernames = [entry['username'] for entry in self.data]
-        pos_x = [entry['pos_x'] for entry in self.data]
-        pos_y = [entry['pos_y'] for entry in self.data]
+        entries = self.data[since:]
+        titles = [entry['title'] for entry in entries]
+        contents = [entry['content'] for entry in entries]
+        usernames = [entry['username'] for entry in entries]
+        pos_x = [entry['pos_x'] for entry in entries]
+        pos_y = [entry['pos_y'] for entry in entries]
         return titles, contents, usernames, pos_x, pos_y
 
     def save(self):